@@ -1,22 +1,51 @@
 #!/usr/bin/env python3
 """
-OCR Gaby Flask API - REST API for OCR operations
+OCR Gaby API - REST API for OCR operations
 Maps all CLI flags to API endpoints
+
+Served by Uvicorn (ASGI). Endpoints are async: Tesseract runs in a worker
+thread and Gemini calls are awaited, so slow requests don't block the loop.
+In production run it under Gunicorn with Uvicorn workers:
+
+    gunicorn -c gunicorn.conf.py api:app
 """
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from fastapi import FastAPI, Form, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from werkzeug.utils import secure_filename
+from contextlib import asynccontextmanager
+from typing import Optional, Union
+import asyncio
+import httpx
 import os
 import tempfile
+import time
+import uuid
 from pathlib import Path
+import uvicorn
 from dotenv import load_dotenv
-import json
+from redis import asyncio as aioredis
 
 # Import OCR and Gemini processors
-from cli import OCRProcessor
+from cli import OCRProcessor, available_cpus
+from ocr_pool import create_pool
+from app.cache import ResultCache, cache_redis
+from app.config import settings
+from app.sessions import UploadSessionStore
+from app.tasks import JOB_TIMEOUT, RESULT_TTL, get_queue, run_gemini, stash_api_key, valid_callback_url
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from app.uploads import (
+    BufferPool,
+    MultipartForm,
+    UploadedFile,
+    UploadError,
+    UploadTooLargeError,
+    parse_multipart,
+)
 try:
-    from app.gemini import GeminiProcessor
+    from app.gemini import TASK_DESCRIPTIONS, get_gemini
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
@@ -24,87 +53,343 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+# Shared Gemini HTTP client settings
+GEMINI_HTTP_TIMEOUT = 120  # seconds
+GEMINI_KEEPALIVE = 100
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open one HTTP/2 client for Gemini calls and close it on shutdown
+    
+    Also clears out upload files left behind by sessions that expired
+    while no worker was running.
+    """
+    await sweep_stale_uploads()
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=GEMINI_HTTP_TIMEOUT,
+        limits=httpx.Limits(max_keepalive_connections=GEMINI_KEEPALIVE)
+    )
+    try:
+        yield
+    finally:
+        await app.state.http_client.aclose()
+
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="OCR Gaby",
+    description="OCR API with optional Gemini LLM processing",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Enable CORS for React frontend
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # Configuration
-UPLOAD_FOLDER = tempfile.gettempdir()
-ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'bmp', 'tiff', 'tif', 'gif', 'webp', 'pdf'}
+UPLOAD_FOLDER = Path(tempfile.gettempdir())
+ALLOWED_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'bmp', 'tiff', 'tif', 'gif', 'webp', 'pdf'})
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB (increased from 10MB)
 CHUNK_SIZE = 1024 * 1024  # 1MB chunks for streaming
+CHUNK_BUFFERS = 8  # idle chunk buffers kept for reuse
+UPLOAD_SWEEP_INTERVAL = 300  # seconds between sweeps for abandoned upload files
+
+# Form fields read by each upload endpoint (other parts are discarded)
+OCR_FORM_FIELDS = ('language', 'config', 'preprocess', 'verbose')
+GEMINI_FORM_FIELDS = OCR_FORM_FIELDS + (
+    'gemini_task', 'gemini_prompt', 'gemini_temperature',
+    'gemini_max_tokens', 'gemini_api_key', 'background', 'callback_url'
+)
+BATCH_FORM_FIELDS = (
+    'language', 'config', 'preprocess', 'use_gemini', 'gemini_task',
+    'background', 'callback_url'
+)
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+# Maximum number of Tesseract runs in flight at once, across all requests
+OCR_CONCURRENCY = int(os.getenv('OCR_CONCURRENCY', available_cpus()))
+
+# Persistent Tesseract engines per (language, config) when tesserocr is installed
+OCR_POOL_SIZE = int(os.getenv('OCR_POOL_SIZE', OCR_CONCURRENCY))
+
+# Maximum number of Gemini requests in flight at once, across all requests
+GEMINI_CONCURRENCY = int(os.getenv('GEMINI_CONCURRENCY', 16))
 
 # Initialize processors
-ocr_processor = OCRProcessor()
+ocr_pool = create_pool(OCR_POOL_SIZE)
+ocr_processor = OCRProcessor(pool=ocr_pool)
+ocr_semaphore = asyncio.Semaphore(OCR_CONCURRENCY)
+gemini_semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+# Background Gemini jobs, run by `rq worker gemini`
+gemini_queue = get_queue()
 
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, extension = filename.rpartition('.')
+    return bool(dot) and extension.lower() in ALLOWED_EXTENSIONS
+
+
+@app.middleware('http')
+async def limit_content_length(request: Request, call_next):
+    """Reject request bodies larger than MAX_FILE_SIZE"""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE:
+        return JSONResponse({
+            'success': False,
+            'error': f'Request too large. Maximum size is {MAX_FILE_SIZE / (1024*1024)}MB'
+        }, status_code=413)
+    return await call_next(request)
 
 
-@app.route('/health', methods=['GET'])
-def health_check():
+@app.get('/health')
+async def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return {
         'status': 'healthy',
         'gemini_available': GEMINI_AVAILABLE,
         'version': '1.0.0'
-    })
+    }
 
 
-@app.route('/languages', methods=['GET'])
-def get_languages():
+@app.get('/languages')
+async def get_languages():
     """
     Get available Tesseract languages
     Maps to: --languages flag
     """
     try:
-        languages = ocr_processor.get_available_languages()
-        return jsonify({
+        languages = await asyncio.to_thread(ocr_processor.get_available_languages)
+        return {
             'success': True,
             'languages': sorted(languages)
-        })
+        }
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
-@app.route('/gemini/tasks', methods=['GET'])
-def get_gemini_tasks():
+@app.get('/gemini/tasks')
+async def get_gemini_tasks():
     """
     Get available Gemini tasks
     Maps to: --gemini-tasks flag
     """
     if not GEMINI_AVAILABLE:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': 'Gemini integration not available'
-        }), 400
-    
-    tasks = {
-        "analyze": "Analyze document structure and content",
-        "summarize": "Create a concise summary",
-        "structure": "Clean and organize the text",
-        "extract": "Extract key information and data",
-        "translate": "Detect language and translate to English",
-        "validate": "Validate and fact-check information",
-        "format": "Format into professional document"
-    }
+        }, status_code=400)
     
-    return jsonify({
+    return {
         'success': True,
-        'tasks': tasks
-    })
+        'tasks': dict(TASK_DESCRIPTIONS)
+    }
+
 
+async def read_upload_form(request: Request, file_field: str, value_fields) -> MultipartForm:
+    """Read an upload request into memory, keeping only the given fields"""
+    return await parse_multipart(
+        request,
+        file_fields=(file_field,),
+        value_fields=value_fields,
+        max_size=MAX_FILE_SIZE
+    )
 
-@app.route('/ocr', methods=['POST'])
-def process_ocr():
+
+def preallocate_file(path: Union[str, Path], size: int) -> None:
+    """Create a file and reserve size bytes of disk for it up front"""
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        if size > 0:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                # Not every platform/filesystem supports fallocate
+                os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def remove_stale_uploads(folder: Path, max_age: float) -> None:
+    """
+    Delete chunked-upload temp files not written to for max_age seconds
+    
+    Every chunk write updates the file's mtime and refreshes its session,
+    so a file this old belongs to a session Redis has already expired.
+    """
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.name.startswith('upload_'):
+            continue
+        try:
+            uuid.UUID(entry.name[len('upload_'):])
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except (ValueError, OSError):
+            continue
+
+
+_last_upload_sweep = 0.0
+
+
+async def sweep_stale_uploads() -> None:
+    """Run remove_stale_uploads off the event loop, at most every UPLOAD_SWEEP_INTERVAL"""
+    global _last_upload_sweep
+    now = time.monotonic()
+    if _last_upload_sweep and now - _last_upload_sweep < UPLOAD_SWEEP_INTERVAL:
+        return
+    _last_upload_sweep = now
+    await asyncio.to_thread(remove_stale_uploads, UPLOAD_FOLDER, upload_sessions.ttl)
+
+
+async def run_ocr(
+    image: Union[str, bytes],
+    language: str = 'eng',
+    config: str = '--psm 6',
+    preprocess: bool = False
+) -> dict:
+    """
+    Run OCR in a worker thread, capped at OCR_CONCURRENCY runs at a time
+    
+    Tesseract runs as a subprocess, so concurrent runs use separate cores
+    while the calling threads just wait on the child process.
+    
+    Results for uploaded bytes are cached by content hash, so the same
+    image with the same options is only OCR'd once.
+    """
+    cache_key = None
+    if isinstance(image, bytes):
+        cache_key = await asyncio.to_thread(
+            ResultCache.ocr_key, image, language, config, preprocess
+        )
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    async with ocr_semaphore:
+        result = await asyncio.to_thread(
+            ocr_processor.extract_text,
+            image,
+            language=language,
+            config=config,
+            preprocess=preprocess,
+            # The semaphore already bounds OCR across requests
+            max_workers=1
+        )
+    
+    if cache_key and 'error' not in result:
+        await result_cache.set(cache_key, result)
+    return result
+
+
+async def process_with_gemini(
+    request: Request,
+    api_key: Optional[str],
+    text: str,
+    task: str = 'analyze',
+    prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None
+) -> dict:
+    """
+    Process OCR text with Gemini, reusing the cached result for identical input
+    
+    At most GEMINI_CONCURRENCY requests are sent to Gemini at once.
+    """
+    cache_key = ResultCache.gemini_key(text, task, prompt, temperature, max_tokens)
+    cached = await result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    async with gemini_semaphore:
+        result = await get_gemini(api_key).process_text_async(
+            text,
+            prompt=prompt,
+            task=task,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            client=gemini_client(request)
+        )
+    
+    if result.get('success'):
+        await result_cache.set(cache_key, result)
+    return result
+
+
+async def enqueue_gemini(
+    text: str,
+    api_key: Optional[str] = None,
+    callback_url: Optional[str] = None,
+    **options
+) -> str:
+    """
+    Queue Gemini processing for a background worker and return the job id
+    
+    The API key goes to Redis under a short-lived key of its own rather
+    than into the job's stored arguments (see app.tasks).
+    """
+    def enqueue() -> str:
+        api_key_ref = stash_api_key(gemini_queue.connection, api_key) if api_key else None
+        return gemini_queue.enqueue(
+            run_gemini,
+            text,
+            api_key_ref=api_key_ref,
+            callback_url=callback_url,
+            job_timeout=JOB_TIMEOUT,
+            result_ttl=RESULT_TTL,
+            **options
+        ).id
+    
+    return await asyncio.to_thread(enqueue)
+
+
+def gemini_client(request: Request) -> Optional[httpx.AsyncClient]:
+    """Get the shared Gemini HTTP client, if the app lifespan has started"""
+    return getattr(request.app.state, 'http_client', None)
+
+
+async def read_background_options(form: MultipartForm):
+    """
+    Get (background, callback_url) from a form
+    
+    Sending a callback_url implies background processing.
+    Raises ValueError for a callback URL that isn't http(s) or points at
+    a private, loopback or otherwise disallowed host.
+    """
+    callback_url = form.get('callback_url') or None
+    # Resolving the host can block
+    if callback_url and not await asyncio.to_thread(valid_callback_url, callback_url):
+        raise ValueError('callback_url must be an http(s) URL of an allowed public host')
+    background = bool(callback_url) or form.get('background', 'false').lower() == 'true'
+    return background, callback_url
+
+
+def upload_error_response(error: UploadError) -> JSONResponse:
+    """Map a multipart parsing failure to an error response"""
+    status_code = 413 if isinstance(error, UploadTooLargeError) else 400
+    return JSONResponse({
+        'success': False,
+        'error': str(error)
+    }, status_code=status_code)
+
+
+@app.post('/ocr')
+async def process_ocr(request: Request):
     """
     Process OCR on uploaded image
     
@@ -117,74 +402,66 @@ def process_ocr():
     - verbose: -v, --verbose
     """
     
-    # Validate file upload
-    if 'file' not in request.files:
-        return jsonify({
-            'success': False,
-            'error': 'No file provided'
-        }), 400
-    
-    file = request.files['file']
-    
-    if file.filename == '':
-        return jsonify({
-            'success': False,
-            'error': 'No file selected'
-        }), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({
-            'success': False,
-            'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
-        }), 400
+    try:
+        form = await read_upload_form(request, 'file', OCR_FORM_FIELDS)
+    except UploadError as e:
+        return upload_error_response(e)
     
     try:
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Validate file upload
+        if not form.files['file']:
+            return JSONResponse({
+                'success': False,
+                'error': 'No file provided'
+            }, status_code=400)
+        
+        upload = form.files['file'][0]
+        
+        if not upload.filename:
+            return JSONResponse({
+                'success': False,
+                'error': 'No file selected'
+            }, status_code=400)
+        
+        if not allowed_file(upload.filename):
+            return JSONResponse({
+                'success': False,
+                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+            }, status_code=400)
         
         # Get parameters from request
-        language = request.form.get('language', 'eng')
-        config = request.form.get('config', '--psm 6')
-        preprocess = request.form.get('preprocess', 'false').lower() == 'true'
-        verbose = request.form.get('verbose', 'false').lower() == 'true'
+        language = form.get('language', 'eng')
+        config = form.get('config', '--psm 6')
+        preprocess = form.get('preprocess', 'false').lower() == 'true'
         
-        # Process OCR
-        result = ocr_processor.extract_text(
-            filepath,
+        # Process OCR in a worker thread so the event loop stays free
+        result = await run_ocr(
+            upload.data,
             language=language,
             config=config,
             preprocess=preprocess
         )
         
-        # Clean up temporary file
-        os.remove(filepath)
-        
         if 'error' in result:
-            return jsonify({
+            return JSONResponse({
                 'success': False,
                 'error': result['error']
-            }), 500
+            }, status_code=500)
         
-        return jsonify({
+        return {
             'success': True,
             'data': result
-        })
+        }
         
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
-@app.route('/ocr/gemini', methods=['POST'])
-def process_ocr_with_gemini():
+@app.post('/ocr/gemini')
+async def process_ocr_with_gemini(request: Request):
     """
     Process OCR with Gemini LLM integration
     
@@ -202,81 +479,106 @@ def process_ocr_with_gemini():
     """
     
     if not GEMINI_AVAILABLE:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': 'Gemini integration not available'
-        }), 400
-    
-    # Validate file upload
-    if 'file' not in request.files:
-        return jsonify({
-            'success': False,
-            'error': 'No file provided'
-        }), 400
-    
-    file = request.files['file']
+        }, status_code=400)
     
-    if file.filename == '':
-        return jsonify({
-            'success': False,
-            'error': 'No file selected'
-        }), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({
-            'success': False,
-            'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
-        }), 400
+    try:
+        form = await read_upload_form(request, 'file', GEMINI_FORM_FIELDS)
+    except UploadError as e:
+        return upload_error_response(e)
     
     try:
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Validate file upload
+        if not form.files['file']:
+            return JSONResponse({
+                'success': False,
+                'error': 'No file provided'
+            }, status_code=400)
+        
+        upload = form.files['file'][0]
+        
+        if not upload.filename:
+            return JSONResponse({
+                'success': False,
+                'error': 'No file selected'
+            }, status_code=400)
+        
+        if not allowed_file(upload.filename):
+            return JSONResponse({
+                'success': False,
+                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+            }, status_code=400)
         
         # Get OCR parameters
-        language = request.form.get('language', 'eng')
-        config = request.form.get('config', '--psm 6')
-        preprocess = request.form.get('preprocess', 'false').lower() == 'true'
-        verbose = request.form.get('verbose', 'false').lower() == 'true'
+        language = form.get('language', 'eng')
+        config = form.get('config', '--psm 6')
+        preprocess = form.get('preprocess', 'false').lower() == 'true'
         
         # Get Gemini parameters
-        gemini_task = request.form.get('gemini_task', 'analyze')
-        gemini_prompt = request.form.get('gemini_prompt', None)
-        gemini_temperature = float(request.form.get('gemini_temperature', 0.7))
-        gemini_max_tokens = request.form.get('gemini_max_tokens', None)
+        gemini_task = form.get('gemini_task', 'analyze')
+        gemini_prompt = form.get('gemini_prompt') or None
+        gemini_temperature = float(form.get('gemini_temperature', 0.7))
+        gemini_max_tokens = form.get('gemini_max_tokens', None)
         if gemini_max_tokens:
             gemini_max_tokens = int(gemini_max_tokens)
         
-        gemini_api_key = request.form.get('gemini_api_key') or os.getenv('GEMINI_API_KEY')
+        gemini_api_key = form.get('gemini_api_key') or os.getenv('GEMINI_API_KEY')
         
         if not gemini_api_key:
-            os.remove(filepath)
-            return jsonify({
+            return JSONResponse({
                 'success': False,
                 'error': 'GEMINI_API_KEY not found. Please provide it in the request or set environment variable'
-            }), 400
+            }, status_code=400)
+        
+        try:
+            background, callback_url = await read_background_options(form)
+        except ValueError as e:
+            return JSONResponse({
+                'success': False,
+                'error': str(e)
+            }, status_code=400)
         
         # Process OCR
-        ocr_result = ocr_processor.extract_text(
-            filepath,
+        ocr_result = await run_ocr(
+            upload.data,
             language=language,
             config=config,
             preprocess=preprocess
         )
         
-        # Clean up temporary file
-        os.remove(filepath)
-        
         if 'error' in ocr_result:
-            return jsonify({
+            return JSONResponse({
                 'success': False,
                 'error': ocr_result['error']
-            }), 500
+            }, status_code=500)
+        
+        # Hand Gemini to a background worker; the client polls /jobs/<id>
+        # or receives the result at callback_url
+        if background:
+            job_id = await enqueue_gemini(
+                ocr_result['text'],
+                api_key=form.get('gemini_api_key'),
+                callback_url=callback_url,
+                prompt=gemini_prompt,
+                task=gemini_task,
+                temperature=gemini_temperature,
+                max_tokens=gemini_max_tokens
+            )
+            return JSONResponse({
+                'success': True,
+                'job_id': job_id,
+                'status': 'pending',
+                'data': {
+                    'ocr': ocr_result
+                }
+            }, status_code=202)
         
         # Process with Gemini
-        gemini = GeminiProcessor(gemini_api_key)
-        gemini_result = gemini.process_text(
+        gemini_result = await process_with_gemini(
+            request,
+            gemini_api_key,
             ocr_result['text'],
             prompt=gemini_prompt,
             task=gemini_task,
@@ -284,27 +586,23 @@ def process_ocr_with_gemini():
             max_tokens=gemini_max_tokens
         )
         
-        return jsonify({
+        return {
             'success': True,
             'data': {
                 'ocr': ocr_result,
                 'gemini': gemini_result
             }
-        })
+        }
         
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
-@app.route('/batch/ocr', methods=['POST'])
-def batch_process():
+@app.post('/batch/ocr')
+async def batch_process(request: Request):
     """
     Batch process multiple files
     
@@ -312,81 +610,109 @@ def batch_process():
     Accepts multiple files in the request
     """
     
-    # Validate files
-    if 'files' not in request.files:
-        return jsonify({
-            'success': False,
-            'error': 'No files provided'
-        }), 400
-    
-    files = request.files.getlist('files')
-    
-    if not files or len(files) == 0:
-        return jsonify({
-            'success': False,
-            'error': 'No files selected'
-        }), 400
+    try:
+        form = await read_upload_form(request, 'files', BATCH_FORM_FIELDS)
+    except UploadError as e:
+        return upload_error_response(e)
     
     try:
+        files = form.files['files']
+        
+        # Validate files
+        if not files:
+            return JSONResponse({
+                'success': False,
+                'error': 'No files provided'
+            }, status_code=400)
+        
         # Get parameters
-        language = request.form.get('language', 'eng')
-        config = request.form.get('config', '--psm 6')
-        preprocess = request.form.get('preprocess', 'false').lower() == 'true'
-        use_gemini = request.form.get('use_gemini', 'false').lower() == 'true'
-        gemini_task = request.form.get('gemini_task', 'analyze')
+        language = form.get('language', 'eng')
+        config = form.get('config', '--psm 6')
+        preprocess = form.get('preprocess', 'false').lower() == 'true'
+        use_gemini = form.get('use_gemini', 'false').lower() == 'true'
+        gemini_task = form.get('gemini_task', 'analyze')
+        
+        try:
+            background, callback_url = await read_background_options(form)
+        except ValueError as e:
+            return JSONResponse({
+                'success': False,
+                'error': str(e)
+            }, status_code=400)
         
         results = []
         failed = []
+        accepted = []
         
-        for file in files:
-            if not allowed_file(file.filename):
+        for upload in files:
+            if not allowed_file(upload.filename):
                 failed.append({
-                    'filename': file.filename,
+                    'filename': upload.filename,
                     'error': 'File type not allowed'
                 })
                 continue
+            accepted.append(upload)
+        
+        gemini_api_key = os.getenv('GEMINI_API_KEY')
+        with_gemini = use_gemini and GEMINI_AVAILABLE and bool(gemini_api_key)
+        
+        async def process_file(upload: UploadedFile) -> dict:
+            """OCR one file, then hand its text straight on to Gemini"""
+            result = await run_ocr(
+                upload.data,
+                language=language,
+                config=config,
+                preprocess=preprocess
+            )
+            result['filename'] = secure_filename(upload.filename)
+            
+            if not with_gemini or 'error' in result:
+                return result
             
             try:
-                # Save and process file
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                
-                # Process OCR
-                result = ocr_processor.extract_text(
-                    filepath,
-                    language=language,
-                    config=config,
-                    preprocess=preprocess
-                )
-                
-                result['filename'] = filename
-                
-                # Process with Gemini if requested
-                if use_gemini and GEMINI_AVAILABLE and 'error' not in result:
-                    gemini_api_key = os.getenv('GEMINI_API_KEY')
-                    if gemini_api_key:
-                        gemini = GeminiProcessor(gemini_api_key)
-                        gemini_result = gemini.process_text(
-                            result['text'],
-                            task=gemini_task
-                        )
-                        result['gemini'] = gemini_result
-                
-                results.append(result)
-                
-                # Clean up
-                os.remove(filepath)
-                
+                if background:
+                    job_id = await enqueue_gemini(
+                        result['text'],
+                        callback_url=callback_url,
+                        task=gemini_task
+                    )
+                    result['gemini'] = {'job_id': job_id, 'status': 'pending'}
+                else:
+                    result['gemini'] = await process_with_gemini(
+                        request,
+                        gemini_api_key,
+                        result['text'],
+                        task=gemini_task
+                    )
             except Exception as e:
+                result['gemini'] = {
+                    'success': False,
+                    'error': str(e),
+                    'task': gemini_task,
+                    'response': None
+                }
+            return result
+        
+        # Every file runs as its own OCR -> Gemini pipeline, so Gemini calls
+        # for finished files overlap with OCR of the rest. run_ocr and
+        # process_with_gemini cap how many of each stage run at once.
+        outcomes = await asyncio.gather(
+            *(process_file(upload) for upload in accepted),
+            return_exceptions=True
+        )
+        
+        for upload, outcome in zip(accepted, outcomes):
+            if isinstance(outcome, Exception):
                 failed.append({
-                    'filename': file.filename,
-                    'error': str(e)
+                    'filename': upload.filename,
+                    'error': str(outcome)
                 })
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+            else:
+                results.append(outcome)
+        
+        pending = any(result.get('gemini', {}).get('status') == 'pending' for result in results)
         
-        return jsonify({
+        return JSONResponse({
             'success': True,
             'data': {
                 'total': len(files),
@@ -395,22 +721,62 @@ def batch_process():
                 'results': results,
                 'failures': failed
             }
-        })
+        }, status_code=202 if pending else 200)
         
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
+
+
+@app.get('/jobs/{job_id}')
+def get_job_status(job_id: str):
+    """
+    Poll a background Gemini job
+    
+    Returns the job status (queued, started, finished, failed) and,
+    once finished, the Gemini result.
+    """
+    try:
+        job = Job.fetch(job_id, connection=gemini_queue.connection)
+    except NoSuchJobError:
+        return JSONResponse({
+            'success': False,
+            'error': 'Job not found'
+        }, status_code=404)
+    
+    status = job.get_status()
+    response = {
+        'success': True,
+        'job_id': job.id,
+        'status': status
+    }
+    
+    if status == 'finished':
+        response['result'] = job.return_value()
+    elif status == 'failed':
+        response['error'] = 'Gemini job failed'
+    
+    return response
 
 
 # === CHUNKED UPLOAD ENDPOINTS ===
-# Store for managing chunked uploads
-UPLOAD_SESSIONS = {}
+# Session state (and the OCR/Gemini result cache) is shared by all
+# workers through Redis
+redis_client = aioredis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True,
+    socket_timeout=settings.REDIS_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_TIMEOUT
+)
+upload_sessions = UploadSessionStore(redis_client)
+result_cache = ResultCache(cache_redis())
+chunk_buffers = BufferPool(CHUNK_BUFFERS)
 
 
-@app.route('/upload/init', methods=['POST'])
-def init_chunked_upload():
+@app.post('/upload/init')
+async def init_chunked_upload(request: Request):
     """
     Initialize a chunked upload session
     Returns an upload_id to use for subsequent chunks
@@ -423,114 +789,172 @@ def init_chunked_upload():
     }
     """
     try:
-        data = request.json
+        data = await request.json()
         filename = secure_filename(data.get('filename', ''))
-        filesize = data.get('filesize', 0)
-        chunk_count = data.get('chunk_count', 0)
+        filesize = data.get('filesize')
+        chunk_count = data.get('chunk_count')
         
-        if not filename or not allowed_file(filename):
-            return jsonify({
+        if not allowed_file(filename):
+            return JSONResponse({
                 'success': False,
                 'error': 'Invalid filename or file type'
-            }), 400
+            }, status_code=400)
+        
+        # bool is an int subclass, but never a valid size
+        if (not isinstance(filesize, int) or isinstance(filesize, bool) or filesize <= 0
+                or not isinstance(chunk_count, int) or isinstance(chunk_count, bool)):
+            return JSONResponse({
+                'success': False,
+                'error': 'filesize and chunk_count must be positive integers'
+            }, status_code=400)
         
         if filesize > MAX_FILE_SIZE:
-            return jsonify({
+            return JSONResponse({
                 'success': False,
                 'error': f'File too large. Maximum size is {MAX_FILE_SIZE / (1024*1024)}MB'
-            }), 400
+            }, status_code=400)
+        
+        # Every chunk but the last is exactly CHUNK_SIZE bytes
+        if chunk_count != -(-filesize // CHUNK_SIZE):
+            return JSONResponse({
+                'success': False,
+                'error': f'chunk_count does not match filesize with {CHUNK_SIZE} byte chunks'
+            }, status_code=400)
         
         # Generate unique upload ID
-        import uuid
         upload_id = str(uuid.uuid4())
         
-        # Create temporary file path
-        temp_path = os.path.join(UPLOAD_FOLDER, f'upload_{upload_id}')
+        # Reserving disk for every init means abandoned sessions must not
+        # keep their files
+        await sweep_stale_uploads()
+        
+        # Create the temporary file at its full size so chunks can be
+        # written at their own offsets, in any order
+        temp_path = UPLOAD_FOLDER / f'upload_{upload_id}'
+        await asyncio.to_thread(preallocate_file, temp_path, filesize)
         
         # Store session info
-        UPLOAD_SESSIONS[upload_id] = {
-            'filename': filename,
-            'filesize': filesize,
-            'chunk_count': chunk_count,
-            'received_chunks': [],
-            'temp_path': temp_path
-        }
+        try:
+            await upload_sessions.create(
+                upload_id,
+                filename=filename,
+                filesize=filesize,
+                chunk_count=chunk_count,
+                temp_path=str(temp_path)
+            )
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
         
-        return jsonify({
+        return {
             'success': True,
             'upload_id': upload_id,
             'chunk_size': CHUNK_SIZE
-        })
+        }
         
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
-@app.route('/upload/chunk/<upload_id>', methods=['POST'])
-def upload_chunk(upload_id):
+@app.post('/upload/chunk/{upload_id}')
+async def upload_chunk(upload_id: str, request: Request, chunk_index: int = -1):
     """
     Upload a single chunk
     
-    Form data:
-    - chunk: The file chunk
+    The request body is the raw chunk bytes (any content type).
+    
+    Query parameters:
     - chunk_index: Index of this chunk (0-based)
     """
     try:
-        if upload_id not in UPLOAD_SESSIONS:
-            return jsonify({
+        session = await upload_sessions.get(upload_id)
+        if session is None:
+            return JSONResponse({
                 'success': False,
                 'error': 'Invalid upload session'
-            }), 400
-        
-        session = UPLOAD_SESSIONS[upload_id]
-        
-        # Get chunk data
-        if 'chunk' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No chunk data provided'
-            }), 400
-        
-        chunk = request.files['chunk']
-        chunk_index = int(request.form.get('chunk_index', -1))
+            }, status_code=400)
         
-        if chunk_index < 0:
-            return jsonify({
+        if chunk_index < 0 or chunk_index >= session['chunk_count']:
+            return JSONResponse({
                 'success': False,
                 'error': 'Invalid chunk index'
-            }), 400
+            }, status_code=400)
         
-        # Append chunk to temp file
-        temp_path = session['temp_path']
-        with open(temp_path, 'ab') as f:
-            chunk.save(f)
+        # Only the last chunk may be shorter, and none may run past the
+        # end of the file
+        offset = chunk_index * CHUNK_SIZE
+        expected_bytes = min(CHUNK_SIZE, session['filesize'] - offset)
+        
+        # Gather the body in a pooled buffer, then write it to this chunk's
+        # offset in the temp file with a single write
+        buffer = chunk_buffers.acquire(CHUNK_SIZE)
+        view = memoryview(buffer)
+        try:
+            received_bytes = 0
+            async for data in request.stream():
+                end = received_bytes + len(data)
+                if end > expected_bytes:
+                    return JSONResponse({
+                        'success': False,
+                        'error': f'Chunk too large. Chunk {chunk_index} is {expected_bytes} bytes'
+                    }, status_code=400)
+                view[received_bytes:end] = data
+                received_bytes = end
+            
+            # Reject empty chunks
+            if received_bytes == 0:
+                return JSONResponse({
+                    'success': False,
+                    'error': 'No chunk data provided'
+                }, status_code=400)
+            
+            if received_bytes < expected_bytes:
+                return JSONResponse({
+                    'success': False,
+                    'error': f'Chunk too small. Chunk {chunk_index} is {expected_bytes} bytes'
+                }, status_code=400)
+            
+            with open(session['temp_path'], 'r+b', buffering=0) as f:
+                f.seek(offset)
+                f.write(view[:received_bytes])
+        finally:
+            view.release()
+            chunk_buffers.release(buffer)
         
         # Track received chunks
-        session['received_chunks'].append(chunk_index)
+        received = await upload_sessions.add_chunk(upload_id, chunk_index)
         
         # Check if all chunks received
-        is_complete = len(session['received_chunks']) == session['chunk_count']
+        is_complete = received == session['chunk_count']
         
-        return jsonify({
+        return {
             'success': True,
             'chunk_index': chunk_index,
-            'received': len(session['received_chunks']),
+            'received': received,
             'total': session['chunk_count'],
             'is_complete': is_complete
-        })
+        }
         
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
-@app.route('/upload/complete/<upload_id>', methods=['POST'])
-def complete_chunked_upload(upload_id):
+@app.post('/upload/complete/{upload_id}')
+async def complete_chunked_upload(
+    request: Request,
+    upload_id: str,
+    language: str = Form('eng'),
+    preprocess: str = Form('false'),
+    use_gemini: str = Form('false'),
+    gemini_task: str = Form('analyze'),
+    gemini_prompt: str = Form('')
+):
     """
     Complete the chunked upload and process the file
     
@@ -542,109 +966,101 @@ def complete_chunked_upload(upload_id):
     - gemini_prompt: Custom prompt
     """
     try:
-        if upload_id not in UPLOAD_SESSIONS:
-            return jsonify({
+        session = await upload_sessions.get(upload_id)
+        if session is None:
+            return JSONResponse({
                 'success': False,
                 'error': 'Invalid upload session'
-            }), 400
-        
-        session = UPLOAD_SESSIONS[upload_id]
+            }, status_code=400)
         
         # Verify all chunks received
-        if len(session['received_chunks']) != session['chunk_count']:
-            return jsonify({
+        if session['received'] != session['chunk_count']:
+            return JSONResponse({
                 'success': False,
-                'error': f"Incomplete upload: {len(session['received_chunks'])}/{session['chunk_count']} chunks received"
-            }), 400
-        
-        # Get processing parameters
-        language = request.form.get('language', 'eng')
-        preprocess = request.form.get('preprocess', 'false').lower() == 'true'
-        use_gemini = request.form.get('use_gemini', 'false').lower() == 'true'
-        gemini_task = request.form.get('gemini_task', 'analyze')
-        gemini_prompt = request.form.get('gemini_prompt', '')
+                'error': f"Incomplete upload: {session['received']}/{session['chunk_count']} chunks received"
+            }, status_code=400)
         
         # Rename temp file to final name
-        temp_path = session['temp_path']
-        final_path = os.path.join(UPLOAD_FOLDER, session['filename'])
-        os.rename(temp_path, final_path)
+        final_path = Path(session['temp_path']).rename(UPLOAD_FOLDER / session['filename'])
         
         try:
             # Process the file
-            ocr_result = ocr_processor.process_image(
-                final_path,
+            ocr_result = await run_ocr(
+                str(final_path),
                 language=language,
-                preprocess=preprocess
+                preprocess=preprocess.lower() == 'true'
             )
             
             response_data = {'ocr': ocr_result}
             
             # Process with Gemini if requested
-            if use_gemini and GEMINI_AVAILABLE:
-                gemini_processor = GeminiProcessor()
-                gemini_result = gemini_processor.process_text(
+            if use_gemini.lower() == 'true' and GEMINI_AVAILABLE:
+                gemini_result = await process_with_gemini(
+                    request,
+                    os.getenv('GEMINI_API_KEY'),
                     ocr_result['text'],
                     task=gemini_task,
-                    custom_prompt=gemini_prompt if gemini_prompt else None
+                    prompt=gemini_prompt if gemini_prompt else None
                 )
                 response_data['gemini'] = gemini_result
             
-            # Cleanup
-            os.remove(final_path)
-            del UPLOAD_SESSIONS[upload_id]
-            
-            return jsonify({
+            return {
                 'success': True,
                 'data': response_data
-            })
+            }
             
-        except Exception as e:
-            # Cleanup on error
-            if os.path.exists(final_path):
-                os.remove(final_path)
-            del UPLOAD_SESSIONS[upload_id]
-            raise e
+        finally:
+            # Cleanup
+            final_path.unlink(missing_ok=True)
+            await upload_sessions.delete(upload_id)
         
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
-@app.route('/upload/cancel/<upload_id>', methods=['DELETE'])
-def cancel_chunked_upload(upload_id):
+@app.delete('/upload/cancel/{upload_id}')
+async def cancel_chunked_upload(upload_id: str):
     """Cancel a chunked upload and cleanup"""
     try:
-        if upload_id not in UPLOAD_SESSIONS:
-            return jsonify({
+        session = await upload_sessions.get(upload_id)
+        if session is None:
+            return JSONResponse({
                 'success': False,
                 'error': 'Invalid upload session'
-            }), 400
-        
-        session = UPLOAD_SESSIONS[upload_id]
-        temp_path = session['temp_path']
+            }, status_code=400)
         
         # Cleanup temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        Path(session['temp_path']).unlink(missing_ok=True)
         
         # Remove session
-        del UPLOAD_SESSIONS[upload_id]
+        await upload_sessions.delete(upload_id)
         
-        return jsonify({
+        return {
             'success': True,
             'message': 'Upload cancelled'
-        })
+        }
         
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'success': False,
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
 
 if __name__ == '__main__':
     port = int(os.getenv('API_PORT', 5000))
     debug = os.getenv('DEBUG', 'False').lower() == 'true'
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    workers = int(os.getenv('API_WORKERS', 1))
+    
+    # --reload only works with a single worker process
+    uvicorn.run(
+        'api:app',
+        host='0.0.0.0',
+        port=port,
+        reload=debug,
+        workers=1 if debug else workers,
+        loop='uvloop'
+    )
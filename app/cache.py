@@ -0,0 +1,76 @@
+"""
+Content-addressed OCR and Gemini result cache stored in Redis
+
+Results are keyed by a BLAKE2b hash of the input plus every option that
+affects the output, so repeat requests for the same image (client retries,
+batches over the same corpus) skip Tesseract and Gemini entirely. The cache
+fails open: if Redis is unavailable, requests are processed as usual. Give
+it a client with short timeouts (see cache_redis), or an unreachable Redis
+stalls requests instead of failing.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.config import settings
+
+
+def _digest(*parts: bytes) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+def cache_redis(url: str = settings.REDIS_URL, timeout: float = settings.CACHE_REDIS_TIMEOUT) -> aioredis.Redis:
+    """Redis client for ResultCache that gives up after timeout seconds"""
+    return aioredis.from_url(
+        url,
+        decode_responses=True,
+        socket_timeout=timeout,
+        socket_connect_timeout=timeout
+    )
+
+
+class ResultCache:
+    """Redis cache for OCR and Gemini results"""
+
+    def __init__(self, redis: aioredis.Redis, ttl: int = settings.CACHE_TTL):
+        self.redis = redis
+        self.ttl = ttl
+
+    @staticmethod
+    def ocr_key(data: bytes, language: str, config: str, preprocess: bool) -> str:
+        """Cache key for OCR of the given file contents"""
+        return "ocr:" + _digest(data, f"|{language}|{config}|{preprocess}".encode())
+
+    @staticmethod
+    def gemini_key(
+        text: str,
+        task: str,
+        prompt: Optional[str],
+        temperature: float,
+        max_tokens: Optional[int]
+    ) -> str:
+        """Cache key for Gemini processing of the given OCR text"""
+        options = json.dumps([task, prompt, temperature, max_tokens])
+        return "gemini:" + _digest(text.encode(), options.encode())
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result, or None on a miss or Redis error"""
+        try:
+            cached = await self.redis.get(key)
+        except (RedisError, OSError):
+            return None
+        return json.loads(cached) if cached else None
+
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Cache a result; Redis errors are ignored"""
+        try:
+            await self.redis.setex(key, self.ttl, json.dumps(result))
+        except (RedisError, OSError):
+            pass
@@ -9,6 +9,11 @@ class Settings:
     
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", 86400))  # OCR/Gemini result cache, seconds
+    # Seconds to wait on Redis before giving up: the result cache fails open,
+    # so it gives up quickly; upload sessions need Redis and wait longer
+    CACHE_REDIS_TIMEOUT: float = float(os.getenv("CACHE_REDIS_TIMEOUT", 0.5))
+    REDIS_TIMEOUT: float = float(os.getenv("REDIS_TIMEOUT", 5))
     
     # API
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
@@ -20,6 +25,12 @@ class Settings:
     TESSERACT_CMD: str = os.getenv("TESSERACT_CMD", "/usr/bin/tesseract")
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", 10485760))  # 10MB
     
+    # Background Gemini jobs: hosts callback URLs may point at. When empty,
+    # any host that resolves only to public addresses is allowed
+    CALLBACK_ALLOWED_HOSTS: list = [
+        host.strip().lower() for host in os.getenv("CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+    ]
+    
     # File storage
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "/tmp/uploads")
 
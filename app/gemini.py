@@ -4,88 +4,59 @@ Gemini LLM integration for OCR text processing
 
 import os
 import google.generativeai as genai
-from typing import Optional, Dict, Any
+import httpx
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping, Tuple
 import json
+import re
+
+# genai.configure() sets process-wide state, so remember the key it was
+# last called with and skip reconfiguring for the same key
+_configured_api_key: Optional[str] = None
+
+# REST endpoint used when a shared HTTP client is passed to process_text_async
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+# generation_config keys as spelled by the REST API
+_REST_CONFIG_KEYS = {
+    "top_p": "topP",
+    "top_k": "topK",
+    "max_output_tokens": "maxOutputTokens",
+}
+
+# Multi-document prompts for process_text_batch_async
+_DOC_START = "<<<DOC_{}_START>>>"
+_DOC_END = "<<<DOC_{}_END>>>"
+_DOC_ANSWER = re.compile(r"<<<DOC_(\d+)_START>>>(.*?)<<<DOC_\1_END>>>", re.DOTALL)
+_BATCH_PROMPT = """You will receive {count} separate OCR-extracted documents. Each document is wrapped in markers like <<<DOC_1_START>>> ... <<<DOC_1_END>>>.
+
+Apply the instructions below to each document independently. Reply with exactly one answer per document, wrapped in the same markers as its document (<<<DOC_n_START>>> your answer <<<DOC_n_END>>>), in document order, with nothing outside the markers.
+
+Instructions:
+{instructions}
+
+{documents}
+"""
+
+# Predefined tasks and what they do, shared by the CLI and API listings
+TASK_DESCRIPTIONS: Mapping[str, str] = MappingProxyType({
+    "analyze": "Analyze document structure and content",
+    "summarize": "Create a concise summary",
+    "structure": "Clean and organize the text",
+    "extract": "Extract key information and data",
+    "translate": "Detect language and translate to English",
+    "validate": "Validate and fact-check information",
+    "format": "Format into professional document"
+})
 
 
 class GeminiProcessor:
     """Handle text processing with Google's Gemini LLM"""
     
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        self.model_type = os.getenv('GEMINI_MODEL_TYPE', 'gemini-2.5-flash')
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(self.model_type)
-    
-    def process_text(
-        self,
-        text: str,
-        prompt: Optional[str] = None,
-        task: str = "analyze",
-        temperature: float = 0.7,
-        max_tokens: Optional[int] = None
-    ) -> Dict[str, Any]:
-        """
-        Process OCR text with Gemini
-        
-        Args:
-            text: The extracted OCR text
-            prompt: Custom prompt for processing
-            task: Predefined task type
-            temperature: Response creativity (0.0-1.0)
-            max_tokens: Maximum tokens in response
-        """
-        
-        try:
-            # Build the prompt based on task or custom prompt
-            if prompt:
-                full_prompt = f"{prompt}\n\nText to process:\n{text}"
-            else:
-                full_prompt = self._build_task_prompt(text, task)
-            
-            # Configure generation parameters
-            generation_config = {
-                "temperature": temperature,
-                "top_p": 0.95,
-                "top_k": 64,
-            }
-            
-            if max_tokens:
-                generation_config["max_output_tokens"] = max_tokens
-            
-            # Generate response
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=generation_config
-            )
-            
-            return {
-                "success": True,
-                "response": response.text,
-                "task": task,
-                "prompt_used": full_prompt,
-                "usage": {
-                    "prompt_tokens": len(full_prompt.split()),
-                    "completion_tokens": len(response.text.split()) if response.text else 0
-                }
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "task": task,
-                "response": None
-            }
-    
-    def _build_task_prompt(self, text: str, task: str) -> str:
-        """Build prompts for predefined tasks"""
-        
-        prompts = {
-            "analyze": f"""
+    # Task prompt templates, filled in with str.format(text=...)
+    _PROMPTS: Dict[str, str] = {
+        "analyze": """
 Analyze the following OCR-extracted text and provide insights:
 
 1. Document type and structure
@@ -97,22 +68,22 @@ Analyze the following OCR-extracted text and provide insights:
 Text to analyze:
 {text}
 """,
-            
-            "summarize": f"""
+        
+        "summarize": """
 Create a concise summary of the following OCR-extracted text. Focus on the main points and key information:
 
 Text to summarize:
 {text}
 """,
-            
-            "structure": f"""
+        
+        "structure": """
 Structure and organize the following OCR-extracted text into a clean, readable format. Fix any OCR errors and improve formatting:
 
 Text to structure:
 {text}
 """,
-            
-            "extract": f"""
+        
+        "extract": """
 Extract and organize key information from the following OCR text. Identify:
 - Names, dates, addresses
 - Important numbers, amounts, IDs
@@ -124,15 +95,15 @@ Present the information in a structured format (JSON or organized list):
 Text to extract from:
 {text}
 """,
-            
-            "translate": f"""
+        
+        "translate": """
 First, detect the language of the following OCR-extracted text, then translate it to English. If it's already in English, just clean up any OCR errors:
 
 Text to translate:
 {text}
 """,
-            
-            "validate": f"""
+        
+        "validate": """
 Validate and fact-check the information in the following OCR-extracted text. Look for:
 - Inconsistencies or errors
 - Missing information
@@ -142,33 +113,304 @@ Validate and fact-check the information in the following OCR-extracted text. Loo
 Text to validate:
 {text}
 """,
-            
-            "format": f"""
+        
+        "format": """
 Format the following OCR-extracted text into a professional document format. Clean up OCR errors, improve structure, and make it presentation-ready:
 
 Text to format:
 {text}
 """
+    }
+    
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.model_type = os.getenv('GEMINI_MODEL_TYPE', 'gemini-2.5-flash')
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        
+        global _configured_api_key
+        if _configured_api_key != self.api_key:
+            genai.configure(api_key=self.api_key)
+            _configured_api_key = self.api_key
+        self.model = genai.GenerativeModel(self.model_type)
+    
+    def process_text(
+        self,
+        text: str,
+        prompt: Optional[str] = None,
+        task: str = "analyze",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Process OCR text with Gemini
+        
+        Args:
+            text: The extracted OCR text
+            prompt: Custom prompt for processing
+            task: Predefined task type
+            temperature: Response creativity (0.0-1.0)
+            max_tokens: Maximum tokens in response
+        """
+        
+        try:
+            full_prompt, generation_config = self._prepare_request(
+                text, prompt, task, temperature, max_tokens
+            )
+            
+            # Generate response
+            response = self.model.generate_content(
+                full_prompt,
+                generation_config=generation_config
+            )
+            
+            return self._build_result(response.text, self._sdk_usage(response), task, full_prompt)
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "task": task,
+                "response": None
+            }
+    
+    async def process_text_async(
+        self,
+        text: str,
+        prompt: Optional[str] = None,
+        task: str = "analyze",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        client: Optional[httpx.AsyncClient] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of process_text for use inside an event loop
+        
+        Awaits the Gemini call instead of blocking a worker thread, so many
+        requests can be in flight at once. Takes the same arguments and
+        returns the same result shape as process_text.
+        
+        When client is given, the request goes to the Gemini REST API
+        through it, so callers can share one keep-alive HTTP/2 connection
+        pool across requests.
+        """
+        
+        try:
+            full_prompt, generation_config = self._prepare_request(
+                text, prompt, task, temperature, max_tokens
+            )
+            
+            response_text, usage = await self._generate_async(
+                full_prompt, generation_config, client
+            )
+            
+            return self._build_result(response_text, usage, task, full_prompt)
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "task": task,
+                "response": None
+            }
+    
+    async def process_text_batch_async(
+        self,
+        texts: List[str],
+        prompt: Optional[str] = None,
+        task: str = "analyze",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        client: Optional[httpx.AsyncClient] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process several OCR texts with a single Gemini request
+        
+        Each text is wrapped in numbered markers and Gemini is asked to
+        answer each one inside the same markers. Returns one result per
+        text, in order, shaped like process_text's; token usage is only
+        known for the whole request, so it is reported on the first result,
+        and prompt_used holds only the shared instructions rather than the
+        whole request. A text whose answer is missing from the reply gets
+        an error result.
+        """
+        
+        try:
+            full_prompt, generation_config = self._prepare_request(
+                "(each document below)", prompt, task, temperature, max_tokens
+            )
+            instructions = full_prompt.strip()
+            documents = "\n\n".join(
+                f"{_DOC_START.format(i)}\n{text}\n{_DOC_END.format(i)}"
+                for i, text in enumerate(texts, 1)
+            )
+            full_prompt = _BATCH_PROMPT.format(
+                count=len(texts),
+                instructions=instructions,
+                documents=documents
+            )
+            
+            response_text, usage = await self._generate_async(
+                full_prompt, generation_config, client
+            )
+        except Exception as e:
+            return [
+                {"success": False, "error": str(e), "task": task, "response": None}
+                for _ in texts
+            ]
+        
+        answers = {
+            int(match.group(1)): match.group(2).strip()
+            for match in _DOC_ANSWER.finditer(response_text or "")
         }
+        no_usage = {"prompt_tokens": None, "completion_tokens": None}
         
-        return prompts.get(task, prompts["analyze"])
+        results = []
+        for i in range(1, len(texts) + 1):
+            if i in answers:
+                results.append(self._build_result(
+                    answers[i], usage if i == 1 else no_usage, task, instructions
+                ))
+            else:
+                results.append({
+                    "success": False,
+                    "error": f"Document {i} missing from batched Gemini response",
+                    "task": task,
+                    "response": None
+                })
+        return results
     
-    def get_available_tasks(self) -> Dict[str, str]:
-        """Get list of available predefined tasks"""
+    async def _generate_async(
+        self,
+        full_prompt: str,
+        generation_config: Dict[str, Any],
+        client: Optional[httpx.AsyncClient]
+    ) -> Tuple[str, Dict[str, Optional[int]]]:
+        """Run one generateContent call, over REST when a client is given"""
+        if client is not None:
+            return await self._generate_rest(client, full_prompt, generation_config)
+        
+        response = await self.model.generate_content_async(
+            full_prompt,
+            generation_config=generation_config
+        )
+        return response.text, self._sdk_usage(response)
+    
+    def _prepare_request(
+        self,
+        text: str,
+        prompt: Optional[str],
+        task: str,
+        temperature: float,
+        max_tokens: Optional[int]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Build the full prompt and generation config for a request"""
+        
+        # Build the prompt based on task or custom prompt
+        if prompt:
+            full_prompt = f"{prompt}\n\nText to process:\n{text}"
+        else:
+            full_prompt = self._build_task_prompt(text, task)
+        
+        # Configure generation parameters
+        generation_config = {
+            "temperature": temperature,
+            "top_p": 0.95,
+            "top_k": 64,
+        }
+        
+        if max_tokens:
+            generation_config["max_output_tokens"] = max_tokens
+        
+        return full_prompt, generation_config
+    
+    async def _generate_rest(
+        self,
+        client: httpx.AsyncClient,
+        full_prompt: str,
+        generation_config: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Optional[int]]]:
+        """Call generateContent over REST and return the response text and token usage"""
+        payload = {
+            "contents": [{"parts": [{"text": full_prompt}]}],
+            "generationConfig": {
+                _REST_CONFIG_KEYS.get(key, key): value
+                for key, value in generation_config.items()
+            }
+        }
+        
+        response = await client.post(
+            GEMINI_API_URL.format(model=self.model_type),
+            json=payload,
+            headers={"x-goog-api-key": self.api_key}
+        )
+        response.raise_for_status()
+        data = response.json()
+        
+        candidates = data.get("candidates")
+        if not candidates:
+            raise ValueError(f"Gemini returned no candidates: {data.get('promptFeedback')}")
+        
+        parts = candidates[0].get("content", {}).get("parts", [])
+        metadata = data.get("usageMetadata", {})
+        usage = {
+            "prompt_tokens": metadata.get("promptTokenCount"),
+            "completion_tokens": metadata.get("candidatesTokenCount")
+        }
+        return "".join(part.get("text", "") for part in parts), usage
+    
+    @staticmethod
+    def _sdk_usage(response) -> Dict[str, Optional[int]]:
+        """
+        Token counts reported by Gemini for an SDK response
+        
+        Counts are None when the installed SDK doesn't expose usage_metadata.
+        """
+        metadata = getattr(response, "usage_metadata", None)
         return {
-            "analyze": "Analyze document structure and content",
-            "summarize": "Create a concise summary",
-            "structure": "Clean and organize the text",
-            "extract": "Extract key information and data",
-            "translate": "Detect language and translate to English",
-            "validate": "Validate and fact-check information",
-            "format": "Format into professional document"
+            "prompt_tokens": getattr(metadata, "prompt_token_count", None),
+            "completion_tokens": getattr(metadata, "candidates_token_count", None)
         }
     
+    def _build_result(
+        self,
+        response_text: str,
+        usage: Dict[str, Optional[int]],
+        task: str,
+        full_prompt: str
+    ) -> Dict[str, Any]:
+        """Convert a Gemini response into the result dict returned to callers"""
+        return {
+            "success": True,
+            "response": response_text,
+            "task": task,
+            "prompt_used": full_prompt,
+            "usage": usage
+        }
+    
+    def _build_task_prompt(self, text: str, task: str) -> str:
+        """Build prompts for predefined tasks"""
+        return self._PROMPTS.get(task, self._PROMPTS["analyze"]).format(text=text)
+    
+    def get_available_tasks(self) -> Dict[str, str]:
+        """Get list of available predefined tasks"""
+        return dict(TASK_DESCRIPTIONS)
+    
     def test_connection(self) -> bool:
         """Test if Gemini API is working"""
         try:
             response = self.model.generate_content("Hello, this is a test.")
             return response.text is not None
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+
+@lru_cache(maxsize=8)
+def get_gemini(api_key: Optional[str] = None) -> GeminiProcessor:
+    """
+    Get a shared GeminiProcessor for an API key
+    
+    Reuses the configured client and model across requests instead of
+    building a new processor for every call.
+    """
+    return GeminiProcessor(api_key)
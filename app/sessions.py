@@ -0,0 +1,82 @@
+"""
+Chunked upload session state stored in Redis
+
+Keeping sessions in Redis instead of process memory lets any API worker
+accept any chunk of an upload, and in-flight uploads survive a worker
+restart. Sessions expire after an hour of inactivity.
+"""
+
+from typing import Any, Dict, Optional
+from redis import asyncio as aioredis
+
+SESSION_TTL = 3600  # seconds
+
+
+class UploadSessionStore:
+    """Redis-backed store for chunked upload sessions"""
+
+    def __init__(self, redis: aioredis.Redis, ttl: int = SESSION_TTL):
+        self.redis = redis
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(upload_id: str) -> str:
+        return f"upload:{upload_id}"
+
+    @staticmethod
+    def _chunks_key(upload_id: str) -> str:
+        return f"upload:{upload_id}:chunks"
+
+    async def create(
+        self,
+        upload_id: str,
+        filename: str,
+        filesize: int,
+        chunk_count: int,
+        temp_path: str
+    ) -> None:
+        """Store a new upload session"""
+        key = self._key(upload_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                'filename': filename,
+                'filesize': filesize,
+                'chunk_count': chunk_count,
+                'temp_path': temp_path
+            })
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def exists(self, upload_id: str) -> bool:
+        """Check whether an upload session exists"""
+        return bool(await self.redis.exists(self._key(upload_id)))
+
+    async def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Get session info, or None if the session doesn't exist"""
+        data = await self.redis.hgetall(self._key(upload_id))
+        if not data:
+            return None
+
+        data['filesize'] = int(data['filesize'])
+        data['chunk_count'] = int(data['chunk_count'])
+        data['received'] = await self.received_count(upload_id)
+        return data
+
+    async def add_chunk(self, upload_id: str, chunk_index: int) -> int:
+        """Record a received chunk and return how many distinct chunks arrived"""
+        chunks_key = self._chunks_key(upload_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(chunks_key, chunk_index)
+            pipe.expire(chunks_key, self.ttl)
+            pipe.expire(self._key(upload_id), self.ttl)
+            pipe.scard(chunks_key)
+            results = await pipe.execute()
+        return results[-1]
+
+    async def received_count(self, upload_id: str) -> int:
+        """Number of distinct chunks received so far"""
+        return await self.redis.scard(self._chunks_key(upload_id))
+
+    async def delete(self, upload_id: str) -> None:
+        """Remove a session and its chunk tracking"""
+        await self.redis.delete(self._key(upload_id), self._chunks_key(upload_id))
@@ -0,0 +1,144 @@
+"""
+Background Gemini jobs
+
+Gemini round trips can take tens of seconds. Instead of holding the HTTP
+request open, the API can enqueue the Gemini step on an RQ queue backed by
+REDIS_URL and answer right away. A worker runs the job, keeps the result in
+Redis for polling and, if the client gave one, POSTs it to a callback URL.
+
+A Gemini API key sent with the request is not put in the job itself,
+which RQ stores in Redis as plain data for RESULT_TTL. It is kept under
+its own key for API_KEY_TTL seconds, and the job deletes it as soon as it
+starts.
+
+Run a worker with:
+    rq worker gemini --url $REDIS_URL
+"""
+
+import ipaddress
+import os
+import socket
+import uuid
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from redis import Redis
+from rq import Queue, get_current_job
+
+from app.config import settings
+
+GEMINI_QUEUE = 'gemini'
+JOB_TIMEOUT = 300  # seconds a worker may spend on one job
+RESULT_TTL = 3600  # seconds finished results stay available for polling
+CALLBACK_TIMEOUT = 10
+API_KEY_TTL = 900  # seconds a queued job's API key is kept before it expires unused
+
+
+def get_queue(connection: Optional[Redis] = None) -> Queue:
+    """Get the queue Gemini jobs are sent to"""
+    return Queue(GEMINI_QUEUE, connection=connection or Redis.from_url(settings.REDIS_URL))
+
+
+def valid_callback_url(url: str) -> bool:
+    """
+    Only allow http(s) callback URLs the worker may safely POST to
+    
+    The host must be in CALLBACK_ALLOWED_HOSTS when that is set, and must
+    otherwise resolve only to public addresses, so callbacks can't reach
+    loopback, link-local (cloud metadata) or private network services.
+    Resolves the host, so it blocks; call it off the event loop.
+    """
+    try:
+        parsed = urlparse(url)
+        host, port = parsed.hostname, parsed.port
+    except ValueError:
+        return False
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    
+    if settings.CALLBACK_ALLOWED_HOSTS:
+        return host.lower() in settings.CALLBACK_ALLOWED_HOSTS
+    
+    try:
+        addresses = socket.getaddrinfo(host, port or parsed.scheme, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError):
+        return False
+    # Every address must be public, or a later lookup could pick another one
+    return all(
+        ipaddress.ip_address(address[4][0].split('%')[0]).is_global for address in addresses
+    )
+
+
+def stash_api_key(connection: Redis, api_key: str) -> str:
+    """Keep an API key for a queued job and return the reference to pass instead"""
+    ref = f"gemini:api_key:{uuid.uuid4().hex}"
+    connection.set(ref, api_key, ex=API_KEY_TTL)
+    return ref
+
+
+def take_api_key(connection: Redis, ref: str) -> Optional[str]:
+    """Get and delete an API key kept by stash_api_key"""
+    with connection.pipeline() as pipe:
+        pipe.get(ref)
+        pipe.delete(ref)
+        api_key, _ = pipe.execute()
+    return api_key.decode() if isinstance(api_key, bytes) else api_key
+
+
+def run_gemini(
+    text: str,
+    task: str = 'analyze',
+    prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    api_key_ref: Optional[str] = None,
+    callback_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Process OCR text with Gemini inside an RQ worker
+
+    api_key_ref names an API key kept with stash_api_key; without one the
+    worker's GEMINI_API_KEY is used. Returns the same result dict as
+    GeminiProcessor.process_text. When callback_url is set the result is
+    also POSTed there as {"job_id", "status", "result"}.
+    """
+    # Imported here so the API can load without google-generativeai installed
+    from app.gemini import get_gemini
+
+    job = get_current_job()
+    api_key = None
+    if api_key_ref:
+        connection = job.connection if job else Redis.from_url(settings.REDIS_URL)
+        api_key = take_api_key(connection, api_key_ref)
+
+    gemini = get_gemini(api_key or os.getenv('GEMINI_API_KEY'))
+    result = gemini.process_text(
+        text,
+        prompt=prompt,
+        task=task,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+
+    if callback_url:
+        # Checked again here: the host may resolve differently by now.
+        # Redirects aren't followed, since they could lead anywhere.
+        if not valid_callback_url(callback_url):
+            result['callback_error'] = 'callback_url is not allowed'
+            return result
+        try:
+            requests.post(
+                callback_url,
+                json={
+                    'job_id': job.id if job else None,
+                    'status': 'finished',
+                    'result': result
+                },
+                timeout=CALLBACK_TIMEOUT,
+                allow_redirects=False
+            )
+        except requests.RequestException as e:
+            result['callback_error'] = str(e)
+
+    return result
@@ -0,0 +1,156 @@
+"""
+Streaming multipart parsing for API uploads
+
+Request bodies are fed to streaming-form-data's C parser as they arrive
+from the socket. Uploaded files are kept in memory (bounded by the request
+size limit) and handed to OCR as bytes, so they never touch the disk.
+"""
+
+from queue import Empty, Full, LifoQueue
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from starlette.requests import Request
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.parser import ParseFailedException
+from streaming_form_data.targets import BaseTarget, ValueTarget
+
+
+class UploadError(Exception):
+    """Raised when a multipart request body cannot be parsed"""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when a request body exceeds the configured size limit"""
+
+
+class UploadedFile(NamedTuple):
+    """A file part received in a multipart request"""
+    filename: str
+    data: bytes
+
+
+class FileListTarget(BaseTarget):
+    """Collect every file part sent under one field name"""
+
+    def __init__(self):
+        super().__init__()
+        self.files: List[UploadedFile] = []
+        self._chunks: List[bytes] = []
+
+    def on_start(self):
+        self._chunks = []
+
+    def on_data_received(self, chunk: bytes):
+        self._chunks.append(chunk)
+
+    def on_finish(self):
+        self.files.append(UploadedFile(self.multipart_filename or '', b''.join(self._chunks)))
+        self._chunks = []
+
+
+class FieldTarget(ValueTarget):
+    """Collect a form field value, remembering whether it was sent at all"""
+
+    def __init__(self):
+        super().__init__()
+        self.received = False
+
+    def on_start(self):
+        self.received = True
+
+
+class BufferPool:
+    """
+    Reusable bytearray scratch buffers
+    
+    Chunk uploads copy the request body into a pooled buffer instead of
+    allocating per request. At most max_idle buffers are kept around;
+    buffers of a different size than requested are dropped.
+    """
+
+    def __init__(self, max_idle: int):
+        self._buffers: LifoQueue = LifoQueue(maxsize=max_idle)
+
+    def acquire(self, size: int) -> bytearray:
+        """Get a buffer of exactly size bytes"""
+        while True:
+            try:
+                buffer = self._buffers.get_nowait()
+            except Empty:
+                return bytearray(size)
+            if len(buffer) == size:
+                return buffer
+
+    def release(self, buffer: bytearray):
+        """Return a buffer to the pool"""
+        try:
+            self._buffers.put_nowait(buffer)
+        except Full:
+            pass
+
+
+class MultipartForm:
+    """Parsed form fields and uploaded files of a multipart request"""
+
+    def __init__(self, fields: Dict[str, str], files: Dict[str, List[UploadedFile]]):
+        self.fields = fields
+        self.files = files
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Get a form field value, like Flask's request.form.get"""
+        return self.fields.get(name, default)
+
+
+async def parse_multipart(
+    request: Request,
+    file_fields: Iterable[str],
+    value_fields: Iterable[str],
+    max_size: int
+) -> MultipartForm:
+    """
+    Parse a multipart/form-data body as it streams in
+
+    Only the named fields are kept; any other parts are discarded as they
+    stream past. A request that isn't multipart yields an empty form so
+    callers can report the missing file themselves.
+
+    Raises:
+        UploadTooLargeError: body is larger than max_size bytes
+        UploadError: body is not valid multipart data, or a field value
+            is not UTF-8
+    """
+
+    file_targets = {name: FileListTarget() for name in file_fields}
+    value_targets = {name: FieldTarget() for name in value_fields}
+    form = MultipartForm({}, {name: target.files for name, target in file_targets.items()})
+
+    content_type = request.headers.get('content-type', '')
+    if not content_type.startswith('multipart/form-data'):
+        return form
+
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        for name, target in {**file_targets, **value_targets}.items():
+            parser.register(name, target)
+
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_size:
+                raise UploadTooLargeError(
+                    f'Request too large. Maximum size is {max_size / (1024*1024)}MB'
+                )
+            parser.data_received(chunk)
+
+    except ParseFailedException as e:
+        raise UploadError(f'Invalid multipart body: {e}') from e
+
+    try:
+        form.fields = {
+            name: target.value.decode('utf-8')
+            for name, target in value_targets.items()
+            if target.received
+        }
+    except UnicodeDecodeError as e:
+        raise UploadError(f'Invalid form field: values must be UTF-8 text ({e.reason})') from e
+    return form
@@ -4,14 +4,26 @@ OCR Gaby Batch CLI - Process multiple images in batch
 """
 
 import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
 import os
+import signal
+import sqlite3
 import sys
-from pathlib import Path
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Optional
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Dict, Optional, Tuple
 import time
-from cli import OCRProcessor
+
+import httpx
+
+from cli import OCRProcessor, available_cpus, engine_identity, is_image_name
+from ocr_cache import DEFAULT_CACHE_PATH, ResultStore
+from ocr_pool import create_pool
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,54 +36,704 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+# Fast non-cryptographic hashing for duplicate detection, when installed
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
 
-def process_file(file_path: str, ocr: OCRProcessor, args, gemini: Optional['GeminiProcessor'] = None) -> Dict:
-    """Process a single file"""
-    start_time = time.time()
-    
-    result = ocr.extract_text(
-        file_path,
-        language=args.language,
-        config=args.config,
-        preprocess=args.preprocess
+HASH_READ_SIZE = 1024 * 1024
+
+# Background readahead hints for upcoming files (Linux and most Unixes)
+FADVISE_AVAILABLE = hasattr(os, 'posix_fadvise')
+
+# C JSON encoder for the results output, when installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Gemini requests of a batch share one HTTP/2 client
+GEMINI_HTTP_TIMEOUT = 120  # seconds
+GEMINI_MAX_CONNECTIONS = 64
+
+# With --gemini-batch-size, grouped Gemini requests open at once; new files
+# are held back while this many are outstanding, so the texts waiting on
+# Gemini stay bounded when OCR outpaces it
+GEMINI_BATCHES_IN_FLIGHT = 16
+
+# Files in progress per OCR worker (hashing, waiting for a slot, in OCR)
+IN_FLIGHT_PER_WORKER = 2
+
+# Threads for prefetching, hashing and result store lookups, kept apart
+# from the --workers OCR threads so short I/O never queues behind OCR
+IO_WORKERS = 4
+
+
+# OCR engine of a worker process, set up by init_ocr_worker
+_worker_ocr: Optional[OCRProcessor] = None
+
+
+def init_ocr_worker(tesseract_cmd: Optional[str], language: str, config: str):
+    """Set up a worker process with its own OCR processor and engine"""
+    global _worker_ocr
+    # Ctrl-C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_ocr = OCRProcessor(tesseract_cmd=tesseract_cmd, pool=create_pool(1, language, config))
+
+
+def _extract_text_in_worker(image, language: str, config: str, preprocess: bool, max_workers: Optional[int]) -> Dict:
+    return _worker_ocr.extract_text(
+        image, language=language, config=config, preprocess=preprocess, max_workers=max_workers
+    )
+
+
+class ProcessPoolOCR:
+    """
+    Stand-in for OCRProcessor that runs extract_text in worker processes
+    
+    Used with --preprocess, where decoding and OpenCV filtering add Python
+    work to every file; separate processes keep that off a shared GIL.
+    Only the file path goes to the worker and the result dict comes back.
+    """
+    
+    def __init__(self, executor: Executor):
+        self.executor = executor
+    
+    def extract_text(
+        self,
+        image,
+        language: str = 'eng',
+        config: str = '--psm 6',
+        preprocess: bool = False,
+        max_workers: Optional[int] = None
+    ) -> Dict:
+        return self.executor.submit(
+            _extract_text_in_worker, image, language, config, preprocess, max_workers
+        ).result()
+
+
+def ocr_process_pool(workers: int, tesseract_cmd: Optional[str], language: str, config: str) -> ProcessPoolExecutor:
+    """Worker processes for ProcessPoolOCR, started from a fork server where available"""
+    context = None
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_ocr_worker,
+        initargs=(tesseract_cmd, language, config)
     )
+
+
+async def process_file(
+    file_path: str,
+    ocr: OCRProcessor,
+    args,
+    semaphore: asyncio.Semaphore,
+    gemini: Optional['GeminiProcessor'] = None,
+    store: Optional[ResultStore] = None,
+    digest: Optional[str] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    io: Optional[Executor] = None
+) -> Dict:
+    """
+    Process a single file
+    
+    OCR runs in a worker thread while holding the semaphore, so at most
+    --workers files are OCR'd at once; the Gemini request is awaited after
+    the slot is released. With a result store and the file's content
+    digest, OCR is skipped when an earlier run already processed the file.
+    Store lookups run on io (see io_executor), or the default executor.
+    """
+    loop = asyncio.get_running_loop()
+    key = None
+    if store is not None and digest is not None:
+        # OCR may run in worker processes, which set --tesseract-cmd only
+        # for themselves, so name the binary explicitly
+        engine = await loop.run_in_executor(
+            io, engine_identity, args.language, getattr(args, 'tesseract_cmd', None)
+        )
+        key = store.key(digest, args.language, args.config, args.preprocess, engine)
+    
+    result = await loop.run_in_executor(io, store.get, key) if key else None
+    if result is None:
+        async with semaphore:
+            start_time = time.time()
+            result = await asyncio.to_thread(
+                ocr.extract_text,
+                file_path,
+                language=args.language,
+                config=args.config,
+                preprocess=args.preprocess,
+                # --workers files are already OCR'd at once
+                max_workers=1
+            )
+        if key and not result.get('error'):
+            await loop.run_in_executor(io, store.set, key, result)
+    else:
+        start_time = time.time()
+        result['cached'] = True
     
-    processing_time = time.time() - start_time
     result['file_path'] = file_path
-    result['processing_time'] = round(processing_time, 2)
     
     # Process with Gemini if available and requested
     if gemini and not result.get('error') and hasattr(args, 'gemini') and args.gemini:
+        result['gemini'] = await gemini.process_text_async(
+            result['text'],
+            prompt=getattr(args, 'gemini_prompt', None),
+            task=getattr(args, 'gemini_task', 'analyze'),
+            temperature=getattr(args, 'gemini_temperature', 0.7),
+            max_tokens=getattr(args, 'gemini_max_tokens', None),
+            client=client
+        )
+    
+    result['processing_time'] = round(time.time() - start_time, 2)
+    return result
+
+
+def file_digest(file_path: str) -> str:
+    """Content hash of a file, used to spot duplicate images"""
+    h = xxhash.xxh3_128() if XXHASH_AVAILABLE else hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def prefetch(file_path: str):
+    """Ask the kernel to start reading a file into the page cache"""
+    if not FADVISE_AVAILABLE:
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def prefetched(files: Iterable[str], ahead: int, executor: Optional[Executor] = None) -> Iterator[str]:
+    """
+    Yield files in order, prefetching each one ahead files before it's due
+    
+    By the time a file is hashed and decoded its contents are usually in
+    the page cache, so reads overlap with OCR of earlier files instead of
+    stalling a worker. With an executor, prefetch runs there rather than
+    on the caller's thread (opening a file can block on a slow disk).
+    """
+    upcoming = deque()
+    for file_path in files:
+        if executor is None:
+            prefetch(file_path)
+        else:
+            executor.submit(prefetch, file_path)
+        upcoming.append(file_path)
+        if len(upcoming) > ahead:
+            yield upcoming.popleft()
+    yield from upcoming
+
+
+def find_image_files(directory: str, recursive: bool = False) -> List[str]:
+    """Find all image files in directory"""
+    image_files = []
+    _scan_images(directory, recursive, image_files)
+    image_files.sort()
+    return image_files
+
+
+def _scan_images(directory: str, recursive: bool, image_files: List[str]):
+    # DirEntry carries the file type from the directory listing, so this
+    # needs no stat() per entry (except for symlinks). Unreadable
+    # directories and entries are skipped, as pathlib's glob did.
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            _scan_images(entry.path, recursive, image_files)
+                    elif entry.is_file() and is_image_name(entry.name):
+                        image_files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        return
+
+
+def dump_json(value, indent: bool = False) -> bytes:
+    """Encode value as UTF-8 JSON, with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(value, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def gemini_http_client() -> httpx.AsyncClient:
+    """HTTP/2 client for the Gemini requests of a batch"""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=GEMINI_HTTP_TIMEOUT,
+        limits=httpx.Limits(max_connections=GEMINI_MAX_CONNECTIONS)
+    )
+
+
+def io_executor() -> ThreadPoolExecutor:
+    """Threads for a batch's prefetching, hashing and result store lookups"""
+    return ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='ocr-gaby-io')
+
+
+def batch_runner(workers: int) -> asyncio.Runner:
+    """Event loop runner whose thread pool has room for every OCR worker"""
+    runner = asyncio.Runner()
+    # The default pool caps at 32 threads
+    runner.get_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+    return runner
+
+
+def collect_files(inputs: List[str], recursive: bool, verbose: bool = False) -> List[str]:
+    """Expand input files and directories into the list of files to process"""
+    files = []
+    for input_path in inputs:
+        if os.path.isfile(input_path):
+            files.append(input_path)
+        elif os.path.isdir(input_path):
+            directory_files = find_image_files(input_path, recursive)
+            files.extend(directory_files)
+            if verbose:
+                print(f"Found {len(directory_files)} images in {input_path}")
+        else:
+            print(f"Warning: {input_path} not found", file=sys.stderr)
+    return files
+
+
+def batch_summary(total_files: int, successful: int, failed_files: List[Tuple[str, str]]) -> Dict:
+    """Summary block of the results document"""
+    return {
+        'total_files': total_files,
+        'successful': successful,
+        'failed': len(failed_files),
+        'success_rate': round((successful / total_files) * 100, 2) if total_files > 0 else 0
+    }
+
+
+class ResultWriter:
+    """
+    Write the batch results JSON incrementally
+    
+    Each result is written as soon as it completes, so memory use doesn't
+    grow with the number of files. The output has the same keys as before
+    ("results", "summary", and "failed_files" when any failed), with the
+    summary written last since it is only known at the end.
+    """
+    
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.count = 0
+        out.write(b'{\n  "results": [')
+    
+    def add(self, result: Dict):
+        """Append one successful result"""
+        separator = b',\n    ' if self.count else b'\n    '
+        self.out.write(separator + dump_json(result))
+        self.count += 1
+    
+    async def drain(self):
+        """Wait for written results to be flushed; file writes already block"""
+    
+    def close(self, summary: Dict, failed_files: List[Dict]):
+        """Finish the document with the summary and any failures"""
+        self.out.write(b'\n  ]' if self.count else b']')
+        self.out.write(b',\n  "summary": ' + self._indented(summary))
+        if failed_files:
+            self.out.write(b',\n  "failed_files": ' + self._indented(failed_files))
+        self.out.write(b'\n}\n')
+    
+    @staticmethod
+    def _indented(value) -> bytes:
+        return dump_json(value, indent=True).replace(b'\n', b'\n  ')
+
+
+async def run_batch(
+    files: Iterable[str],
+    ocr: OCRProcessor,
+    args,
+    writer: ResultWriter,
+    gemini: Optional['GeminiProcessor'] = None,
+    store: Optional[ResultStore] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    io: Optional[Executor] = None
+) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Process every file concurrently
+    
+    Successful results go to writer as they complete; OCR results are
+    looked up in and added to store when one is given. Gemini requests use
+    client, or an HTTP client opened for this batch, and file and store
+    I/O uses io, or an io_executor() for this batch. Returns the number
+    of successful files and the (file, error) pairs of failed ones.
+    """
+    successful = 0
+    failed_files = []
+    
+    # With --gemini-batch-size > 1, Gemini runs once per group of files
+    # instead of inside process_file
+    batch_size = getattr(args, 'gemini_batch_size', 1)
+    batch_gemini = gemini if getattr(args, 'gemini', False) and batch_size > 1 else None
+    file_gemini = None if batch_gemini else gemini
+    pending = []
+    gemini_batches = []
+    
+    semaphore = asyncio.Semaphore(args.workers)
+    
+    # Files started ahead of a free OCR slot; per-file Gemini requests mostly
+    # wait on the network, so they get room of their own
+    window = args.workers * IN_FLIGHT_PER_WORKER
+    if file_gemini is not None and getattr(args, 'gemini', False):
+        window += GEMINI_MAX_CONNECTIONS
+    
+    # Gemini calls are multiplexed over pooled HTTP/2 connections instead
+    # of a connection per request
+    own_client = client is None and gemini is not None and getattr(args, 'gemini', False)
+    if own_client:
+        client = gemini_http_client()
+    
+    own_io = io is None
+    if own_io:
+        io = io_executor()
+    loop = asyncio.get_running_loop()
+    
+    # Files with identical contents are only processed once. Copies found
+    # while the first file is in flight are listed against it and written
+    # out with its result; only the first file's path is remembered after
+    # that, so later copies are processed again (from the store when there
+    # is one) and just marked as duplicates.
+    originals: Dict[str, str] = {}
+    copies_in_flight: Dict[str, List[str]] = {}
+    
+    async def run(file_path: str) -> Tuple[str, Optional[Dict], List[str]]:
         try:
-            gemini_result = gemini.process_text(
-                result['text'],
+            digest = await loop.run_in_executor(io, file_digest, file_path)
+        except OSError:
+            # Let OCR report the unreadable file
+            digest = None
+        
+        if digest in copies_in_flight:
+            copies_in_flight[digest].append(file_path)
+            return file_path, None, []
+        
+        copies = []
+        if digest is not None:
+            copies_in_flight[digest] = copies
+        try:
+            result = await process_file(
+                file_path, ocr, args, semaphore, file_gemini, store, digest, client, io
+            )
+        except Exception as e:
+            result = {'error': str(e)}
+        finally:
+            copies_in_flight.pop(digest, None)
+        
+        if digest is not None:
+            if digest in originals:
+                result['duplicate_of'] = originals[digest]
+            else:
+                originals[digest] = file_path
+        return file_path, result, copies
+    
+    gemini_requests = asyncio.Semaphore(GEMINI_BATCHES_IN_FLIGHT)
+    
+    async def run_gemini_batch(group: List[Tuple[Dict, List[str]]]) -> List[Tuple[Dict, List[str]]]:
+        async with gemini_requests:
+            responses = await batch_gemini.process_text_batch_async(
+                [result['text'] for result, _ in group],
                 prompt=getattr(args, 'gemini_prompt', None),
                 task=getattr(args, 'gemini_task', 'analyze'),
                 temperature=getattr(args, 'gemini_temperature', 0.7),
-                max_tokens=getattr(args, 'gemini_max_tokens', None)
+                max_tokens=getattr(args, 'gemini_max_tokens', None),
+                client=client
             )
-            result['gemini'] = gemini_result
-        except Exception as e:
-            result['gemini'] = {'success': False, 'error': str(e)}
-    
-    return result
+        for (result, _), response in zip(group, responses):
+            result['gemini'] = response
+        return group
+    
+    def record(result: Dict, copies: List[str] = ()):
+        # Copies are written after the original's Gemini response arrived,
+        # so their text is never sent again
+        record_one(result)
+        for copy_path in copies:
+            copy = dict(result)
+            copy['file_path'] = copy_path
+            copy['duplicate_of'] = result.get('duplicate_of', result['file_path'])
+            record_one(copy)
+    
+    def record_one(result: Dict):
+        nonlocal successful
+        writer.add(result)
+        successful += 1
+        if args.verbose:
+            confidence = result.get('confidence', 0)
+            words = result.get('word_count', 0)
+            time_taken = result.get('processing_time', 0)
+            
+            # Check if Gemini was used
+            gemini_info = ""
+            if 'gemini' in result:
+                if result['gemini']['success']:
+                    gemini_info = " + Gemini"
+                else:
+                    gemini_info = " + Gemini (failed)"
+            
+            print(f"✓ {result['file_path']} - {confidence}% confidence, {words} words, {time_taken}s{gemini_info}")
+    
+    def handle(file_path: str, result: Optional[Dict], copies: List[str]):
+        nonlocal pending
+        if result is None:
+            # A copy; it is recorded along with its original
+            return
+        if 'error' in result:
+            for path in [file_path, *copies]:
+                failed_files.append((path, result['error']))
+                if not args.continue_on_error:
+                    print(f"Error processing {path}: {result['error']}", file=sys.stderr)
+                    sys.exit(1)
+                elif args.verbose:
+                    print(f"Failed: {path} - {result['error']}")
+        elif batch_gemini:
+            pending.append((result, copies))
+            if len(pending) >= batch_size:
+                gemini_batches.append(asyncio.ensure_future(run_gemini_batch(pending)))
+                pending = []
+        else:
+            record(result, copies)
+    
+    def flush_gemini_batches():
+        for task in list(gemini_batches):
+            if task.done():
+                gemini_batches.remove(task)
+                for result, copies in task.result():
+                    record(result, copies)
+    
+    in_flight = set()
+    try:
+        # Keep a bounded window of files in flight, so memory stays flat
+        # however many files there are and results stream out right away;
+        # the next window's worth is already being read by the kernel
+        remaining = prefetched(files, window, io)
+        while True:
+            # Only start new files while Gemini batches keep up
+            if len(gemini_batches) < GEMINI_BATCHES_IN_FLIGHT:
+                for file_path in islice(remaining, window - len(in_flight)):
+                    in_flight.add(asyncio.ensure_future(run(file_path)))
+                if not in_flight:
+                    break
+            
+            done, _ = await asyncio.wait(
+                in_flight | set(gemini_batches), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task in in_flight:
+                    in_flight.remove(task)
+                    handle(*task.result())
+            flush_gemini_batches()
+            # Results wait here, not in memory, while the reader catches up
+            await writer.drain()
+    
+        # Send the last partial group and wait for outstanding Gemini batches
+        if pending:
+            gemini_batches.append(asyncio.ensure_future(run_gemini_batch(pending)))
+        if gemini_batches:
+            await asyncio.wait(gemini_batches)
+            flush_gemini_batches()
+            await writer.drain()
+    finally:
+        # Only left behind when the batch stops early, e.g. the reader is gone
+        for task in [*in_flight, *gemini_batches]:
+            task.cancel()
+        if own_client:
+            await client.aclose()
+        if own_io:
+            # Left over prefetches don't need to finish
+            io.shutdown(wait=False, cancel_futures=True)
+    
+    return successful, failed_files
 
 
-def find_image_files(directory: str, recursive: bool = False) -> List[str]:
-    """Find all image files in directory"""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif', '.webp'}
+# Longest batch request line the daemon reads; a shell glob can easily
+# name thousands of absolute paths
+MAX_JOB_REQUEST = 16 * 1024 * 1024
+
+# Options a client may set per batch, with the JSON types each takes;
+# everything else comes from the daemon's own command line
+JOB_OPTIONS = {
+    'language': str,
+    'config': str,
+    'preprocess': bool,
+    'recursive': bool,
+    'gemini': bool,
+    'gemini_task': str,
+    'gemini_prompt': str,
+    'gemini_temperature': (int, float),
+    'gemini_max_tokens': int,
+    'gemini_batch_size': int
+}
+
+
+def job_options(request: Dict) -> Dict:
+    """
+    Get the JOB_OPTIONS a client set in a batch request
+    
+    Raises ValueError naming the first option whose value has the wrong type.
+    """
+    options = {}
+    for name, value in request.items():
+        if name not in JOB_OPTIONS:
+            continue
+        expected = JOB_OPTIONS[name]
+        # JSON true/false are bools, which Python also counts as ints
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise ValueError(f'Invalid value for {name}: {value!r}')
+        options[name] = value
+    return options
+
+
+class LineResultWriter:
+    """Send each result to a daemon client as one JSON line"""
     
-    if recursive:
-        pattern = "**/*"
-    else:
-        pattern = "*"
+    def __init__(self, out: asyncio.StreamWriter):
+        self.out = out
     
-    image_files = []
-    for file_path in Path(directory).glob(pattern):
-        if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-            image_files.append(str(file_path))
+    def add(self, result: Dict):
+        self.out.write(dump_json(result) + b'\n')
     
-    return sorted(image_files)
+    async def drain(self):
+        """Wait while the client is behind on reading results"""
+        await self.out.drain()
+
+
+async def handle_job(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    ocr: OCRProcessor,
+    args,
+    gemini: Optional['GeminiProcessor'] = None,
+    store: Optional[ResultStore] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    io: Optional[Executor] = None
+):
+    """
+    Run one batch for a daemon client
+    
+    The client sends one JSON line with "inputs" and any JOB_OPTIONS. Each
+    successful result is sent back as a JSON line as it completes, followed
+    by a final {"summary", "failed_files"} line, or a single {"error"} line
+    if the request can't be run.
+    """
+    try:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # The line ran past the reader's limit
+            writer.write(dump_json({'error': f'Batch request too large (over {MAX_JOB_REQUEST} bytes)'}) + b'\n')
+            return
+        
+        try:
+            request = json.loads(line)
+            inputs = request.get('inputs', [])
+        except (ValueError, AttributeError):
+            writer.write(dump_json({'error': 'Invalid batch request'}) + b'\n')
+            return
+        if not (isinstance(inputs, list) and all(isinstance(path, str) for path in inputs)):
+            writer.write(dump_json({'error': 'inputs must be a list of paths'}) + b'\n')
+            return
+        
+        try:
+            options = job_options(request)
+        except ValueError as e:
+            writer.write(dump_json({'error': str(e)}) + b'\n')
+            return
+        
+        # Failures are reported to the client instead of exiting the daemon
+        job_args = argparse.Namespace(**{
+            **vars(args),
+            **options,
+            'verbose': False,
+            'continue_on_error': True
+        })
+        if getattr(job_args, 'gemini', False) and gemini is None:
+            writer.write(dump_json({'error': 'Gemini is not enabled on this daemon (start it with --gemini)'}) + b'\n')
+            return
+        
+        files = await asyncio.get_running_loop().run_in_executor(
+            io, collect_files, inputs, job_args.recursive
+        )
+        if not files:
+            writer.write(dump_json({'error': 'No files to process'}) + b'\n')
+            return
+        
+        try:
+            successful, failed_files = await run_batch(
+                files, ocr, job_args, LineResultWriter(writer), gemini, store, client, io
+            )
+        except ConnectionError:
+            # The client went away; its remaining files were cancelled
+            return
+        writer.write(dump_json({
+            'summary': batch_summary(len(files), successful, failed_files),
+            'failed_files': [{'file': f, 'error': e} for f, e in failed_files]
+        }) + b'\n')
+    finally:
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(
+    socket_path: str,
+    ocr: OCRProcessor,
+    args,
+    gemini: Optional['GeminiProcessor'] = None,
+    store: Optional[ResultStore] = None
+):
+    """
+    Serve batches on a Unix socket until interrupted
+    
+    Tesseract engines, the result store and the Gemini HTTP client stay
+    loaded between batches, so a client pays neither interpreter startup
+    nor model loading per run.
+    """
+    client = gemini_http_client() if gemini is not None else None
+    io = io_executor()
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await handle_job(reader, writer, ocr, args, gemini, store, client, io)
+    
+    # The daemon reads any file a client names; only its own user may
+    # connect. The socket is created with those permissions, rather than
+    # changed after it is already accepting connections.
+    umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(handle, path=socket_path, limit=MAX_JOB_REQUEST)
+    finally:
+        os.umask(umask)
+    print(f"Listening on {socket_path}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if client is not None:
+            await client.aclose()
+        io.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
 
 
 def main():
@@ -86,12 +748,13 @@ Examples:
   %(prog)s /path/to/images/ --output results.json
   %(prog)s /path/to/images/ --gemini --gemini-task extract
   %(prog)s /path/to/images/ --gemini --gemini-prompt "Find all invoice numbers"
+  %(prog)s --daemon /tmp/ocr-gaby.sock --workers 4
         """
     )
     
     parser.add_argument(
         'inputs',
-        nargs='+',
+        nargs='*',
         help='Input files or directories'
     )
     
@@ -127,8 +790,8 @@ Examples:
     parser.add_argument(
         '-w', '--workers',
         type=int,
-        default=2,
-        help='Number of worker threads (default: 2)'
+        default=available_cpus(),
+        help='Number of files to OCR at once; each Tesseract run is single-threaded (default: available CPUs, %(default)s)'
     )
     
     parser.add_argument(
@@ -142,6 +805,24 @@ Examples:
         help='Verbose output'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always run OCR instead of reusing results from earlier runs'
+    )
+    
+    parser.add_argument(
+        '--cache-path',
+        default=DEFAULT_CACHE_PATH,
+        help='OCR result cache database (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--daemon',
+        metavar='SOCKET',
+        help='Keep running and serve batches from ocr_client.py on this Unix socket'
+    )
+    
     parser.add_argument(
         '--continue-on-error',
         action='store_true',
@@ -181,15 +862,42 @@ Examples:
             help='Maximum tokens in Gemini response'
         )
         
+        parser.add_argument(
+            '--gemini-batch-size',
+            type=int,
+            default=1,
+            help='Send the texts of this many files to Gemini in one request (default: 1, one request per file)'
+        )
+        
         parser.add_argument(
             '--gemini-api-key',
             help='Gemini API key (or set GEMINI_API_KEY env var)'
         )
     
     args = parser.parse_args()
+    if not args.inputs and not args.daemon:
+        parser.error('the following arguments are required: inputs')
+    
+    # Initialize OCR processor, with one persistent Tesseract engine per
+    # worker when tesserocr is available so traineddata loads once per batch.
+    # Preprocessing adds Python-level work per file, so with --preprocess
+    # each worker is a separate process with its own engine instead.
+    pool = None
+    executor = None
+    if args.preprocess:
+        executor = ocr_process_pool(args.workers, args.tesseract_cmd, args.language, args.config)
+        ocr = ProcessPoolOCR(executor)
+    else:
+        pool = create_pool(args.workers, args.language, args.config)
+        ocr = OCRProcessor(tesseract_cmd=args.tesseract_cmd, pool=pool)
     
-    # Initialize OCR processor
-    ocr = OCRProcessor(tesseract_cmd=args.tesseract_cmd)
+    # Reuse OCR results of files unchanged since an earlier run
+    store = None
+    if not args.no_cache:
+        try:
+            store = ResultStore(args.cache_path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: result cache unavailable, OCR'ing every file: {e}", file=sys.stderr)
     
     # Initialize Gemini processor if requested
     gemini = None
@@ -209,19 +917,23 @@ Examples:
             print(f"Error initializing Gemini: {e}", file=sys.stderr)
             sys.exit(1)
     
-    # Collect all files to process
-    files_to_process = []
+    if args.daemon:
+        try:
+            with batch_runner(args.workers) as runner:
+                runner.run(serve(args.daemon, ocr, args, gemini, store))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.close()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if store is not None:
+                store.close()
+        return
     
-    for input_path in args.inputs:
-        if os.path.isfile(input_path):
-            files_to_process.append(input_path)
-        elif os.path.isdir(input_path):
-            directory_files = find_image_files(input_path, args.recursive)
-            files_to_process.extend(directory_files)
-            if args.verbose:
-                print(f"Found {len(directory_files)} images in {input_path}")
-        else:
-            print(f"Warning: {input_path} not found", file=sys.stderr)
+    # Collect all files to process
+    files_to_process = collect_files(args.inputs, args.recursive, args.verbose)
     
     if not files_to_process:
         print("No files to process", file=sys.stderr)
@@ -231,85 +943,59 @@ Examples:
         print(f"Processing {len(files_to_process)} files with {args.workers} workers")
         print("-" * 50)
     
-    # Process files
-    results = []
-    failed_files = []
+    # Stream results to the output file as they complete (via a temporary
+    # file, so a failed run never leaves a truncated output behind); for
+    # stdout the JSON is collected and printed at the end as before
+    if args.output:
+        partial_path = args.output + '.part'
+        try:
+            out = open(partial_path, 'wb')
+        except OSError as e:
+            print(f"Error saving results: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        out = io.BytesIO()
     
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        # Submit all jobs
-        future_to_file = {
-            executor.submit(process_file, file_path, ocr, args, gemini): file_path
-            for file_path in files_to_process
-        }
-        
-        # Process completed jobs
-        for future in as_completed(future_to_file):
-            file_path = future_to_file[future]
-            
-            try:
-                result = future.result()
-                
-                if 'error' in result:
-                    failed_files.append((file_path, result['error']))
-                    if not args.continue_on_error:
-                        print(f"Error processing {file_path}: {result['error']}", file=sys.stderr)
-                        sys.exit(1)
-                    elif args.verbose:
-                        print(f"Failed: {file_path} - {result['error']}")
-                else:
-                    results.append(result)
-                    if args.verbose:
-                        confidence = result.get('confidence', 0)
-                        words = result.get('word_count', 0)
-                        time_taken = result.get('processing_time', 0)
-                        
-                        # Check if Gemini was used
-                        gemini_info = ""
-                        if 'gemini' in result:
-                            if result['gemini']['success']:
-                                gemini_info = " + Gemini"
-                            else:
-                                gemini_info = " + Gemini (failed)"
-                        
-                        print(f"✓ {file_path} - {confidence}% confidence, {words} words, {time_taken}s{gemini_info}")
-                
-            except Exception as e:
-                failed_files.append((file_path, str(e)))
-                if not args.continue_on_error:
-                    print(f"Error processing {file_path}: {e}", file=sys.stderr)
-                    sys.exit(1)
-                elif args.verbose:
-                    print(f"Failed: {file_path} - {e}")
-    
-    # Summary
-    total_files = len(files_to_process)
-    successful_files = len(results)
-    failed_count = len(failed_files)
-    
-    summary = {
-        'summary': {
-            'total_files': total_files,
-            'successful': successful_files,
-            'failed': failed_count,
-            'success_rate': round((successful_files / total_files) * 100, 2) if total_files > 0 else 0
-        },
-        'results': results
-    }
+    writer = ResultWriter(out)
     
-    if failed_files:
-        summary['failed_files'] = [{'file': f, 'error': e} for f, e in failed_files]
+    # Process files
+    try:
+        with batch_runner(args.workers) as runner:
+            successful_files, failed_files = runner.run(
+                run_batch(files_to_process, ocr, args, writer, gemini, store)
+            )
+        
+        total_files = len(files_to_process)
+        failed_count = len(failed_files)
+        writer.close(
+            batch_summary(total_files, successful_files, failed_files),
+            [{'file': f, 'error': e} for f, e in failed_files]
+        )
+    except BaseException:
+        if args.output:
+            out.close()
+            os.remove(partial_path)
+        raise
+    finally:
+        if pool is not None:
+            pool.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if store is not None:
+            store.close()
     
     # Output results
     if args.output:
         try:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2, ensure_ascii=False)
+            out.close()
+            os.replace(partial_path, args.output)
             print(f"Results saved to: {args.output}")
-        except Exception as e:
+        except OSError as e:
             print(f"Error saving results: {e}", file=sys.stderr)
             sys.exit(1)
     else:
-        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        sys.stdout.flush()
+        sys.stdout.buffer.write(out.getvalue())
     
     # Print summary
     if args.verbose:
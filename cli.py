@@ -3,75 +3,282 @@
 OCR Gaby CLI - Command line interface for OCR operations using Tesseract
 """
 
+import os
+
+# One OpenMP thread per Tesseract run; parallelism comes from running several
+# OCR jobs at once, and multithreaded runs on top of that oversubscribe the
+# CPU. Must be set before Tesseract (or OpenMP via numpy/OpenCV) is loaded.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
 import argparse
 import sys
-import os
-from pathlib import Path
 import pytesseract
 from PIL import Image
 import cv2
 import numpy as np
-from typing import Optional, List
+from typing import Optional, List, Sequence, Union
 import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from itertools import zip_longest
 from dotenv import load_dotenv
+from ocr_pool import TESSEROCR_AVAILABLE, ImageBufferPool, TesseractPool
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+# Extensions treated as images, lowercase and without the dot
+IMAGE_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'bmp', 'tiff', 'tif', 'gif', 'webp'})
+
+PDF_RENDER_SCALE = 2  # 144 DPI, PDF points are 1/72 inch
 
 # Load environment variables
 load_dotenv()
 
 # Import Gemini processor
 try:
-    from app.gemini import GeminiProcessor
+    from app.gemini import TASK_DESCRIPTIONS, GeminiProcessor
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
 
 
+@lru_cache(maxsize=None)
+def engine_identity(language: str, tesseract_cmd: Optional[str] = None) -> str:
+    """
+    Identify the Tesseract build and traineddata that OCR with language uses
+    
+    Covers both the tesseract binary (tesseract_cmd, or pytesseract's
+    current one) and the tesserocr library, plus the size and modification
+    time of each language's traineddata, so cached results can be tied to
+    the engine that produced them. Parts that can't be determined are left
+    out.
+    """
+    parts = []
+    tessdata_dirs = [os.getenv('TESSDATA_PREFIX')]
+    
+    try:
+        listing = subprocess.run(
+            [tesseract_cmd or pytesseract.pytesseract.tesseract_cmd, '--version', '--list-langs'],
+            capture_output=True, text=True, timeout=10
+        )
+        output = listing.stdout + listing.stderr
+        parts.append(output.split('\n', 1)[0])
+        # 'List of available languages in "/usr/share/tessdata/" (3):'
+        if 'available languages in "' in output:
+            tessdata_dirs.append(output.split('available languages in "', 1)[1].split('"', 1)[0])
+    except (OSError, subprocess.SubprocessError):
+        pass
+    
+    if TESSEROCR_AVAILABLE:
+        import tesserocr
+        parts.append(tesserocr.tesseract_version().split('\n', 1)[0])
+        tessdata_dirs.append(tesserocr.get_languages()[0])
+    
+    for name in language.split('+'):
+        for directory in filter(None, tessdata_dirs):
+            try:
+                stat = os.stat(os.path.join(directory, f'{name}.traineddata'))
+            except OSError:
+                continue
+            parts.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+    
+    return '|'.join(parts)
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may run on, honoring affinity masks"""
+    if hasattr(os, 'process_cpu_count'):
+        return os.process_cpu_count() or 1
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def is_image_name(name: str) -> bool:
+    """
+    Check whether a file name has an image extension
+    
+    Like Path(name).suffix, a leading dot alone (".png") is no extension.
+    """
+    dot = name.rfind('.')
+    return dot > 0 and name[dot + 1:].lower() in IMAGE_EXTENSIONS
+
+
+def is_pdf(source: Union[str, bytes, Image.Image]) -> bool:
+    """Check whether a path or file contents is a PDF"""
+    if isinstance(source, bytes):
+        return source[:5] == b'%PDF-'
+    if isinstance(source, str):
+        return source.lower().endswith('.pdf')
+    return False
+
+
+def data_from_tsv(tsv: bytes) -> dict:
+    """
+    Split raw image_to_data TSV output into columns
+    
+    Cheaper than pytesseract's Output.DICT, which converts every cell of
+    every row to a number in Python: columns stay strings, except 'conf',
+    which is parsed into a float array in one call.
+    """
+    rows = tsv.decode('utf-8').splitlines()
+    if not rows:
+        return {'block_num': [], 'par_num': [], 'line_num': [], 'text': [], 'conf': np.empty(0)}
+    
+    header = rows[0].split('\t')
+    # The text of the last row may be missing along with its tab
+    cells = zip_longest(*(row.split('\t', len(header) - 1) for row in rows[1:] if row), fillvalue='')
+    data = dict(zip_longest(header, cells, fillvalue=()))
+    data['conf'] = np.array(data['conf'], dtype=np.float64)
+    return data
+
+
+def otsu_thresholds(images: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Otsu threshold of each of a sequence of uint8 images
+    
+    Same thresholds as cv2.threshold with THRESH_OTSU, but the search
+    over all 256 levels runs for every image in one set of array
+    operations.
+    """
+    histograms = np.stack([np.bincount(image.ravel(), minlength=256) for image in images])
+    probabilities = histograms / histograms.sum(axis=1, keepdims=True)
+    
+    # Weight and cumulative mean of the class below each candidate level
+    below = np.cumsum(probabilities, axis=1)
+    cumulative_mean = np.cumsum(probabilities * np.arange(256), axis=1)
+    total_mean = cumulative_mean[:, -1:]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between_variance = (total_mean * below - cumulative_mean) ** 2 / (below * (1 - below))
+    # Levels with an empty class can't split the image
+    between_variance[~np.isfinite(between_variance)] = 0
+    return between_variance.argmax(axis=1)
+
+
+def binarize_pages(pages: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Otsu-binarize grayscale pages in place, finding all thresholds together
+    
+    Only the page histograms are combined, so pages of any size can be
+    binarized together without copying them into one array.
+    """
+    for page, threshold in zip(pages, otsu_thresholds(pages)):
+        np.multiply(page > threshold, 255, out=page, casting='unsafe')
+    return pages
+
+
+def text_from_data(data: dict) -> str:
+    """
+    Rebuild image_to_string-style text from image_to_data output
+    
+    Words on a line are joined by spaces, lines by newlines, and
+    paragraphs are separated by a blank line.
+    """
+    lines = {}
+    for block, paragraph, line, word in zip(
+        data['block_num'], data['par_num'], data['line_num'], data['text']
+    ):
+        if word.strip():
+            lines.setdefault((block, paragraph, line), []).append(word)
+    
+    text = ''
+    previous_paragraph = None
+    for (block, paragraph, _), words in lines.items():
+        if previous_paragraph is not None:
+            text += '\n' if previous_paragraph == (block, paragraph) else '\n\n'
+        text += ' '.join(words)
+        previous_paragraph = (block, paragraph)
+    
+    return text
+
+
 class OCRProcessor:
     """Handle OCR operations with Tesseract"""
     
-    def __init__(self, tesseract_cmd: Optional[str] = None):
+    def __init__(
+        self,
+        tesseract_cmd: Optional[str] = None,
+        pool: Optional[TesseractPool] = None,
+        buffers: Optional[ImageBufferPool] = None
+    ):
         if tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        
+        # Persistent engines are used when given; otherwise each call
+        # runs the tesseract binary through pytesseract
+        self.pool = pool
+        
+        # Scratch arrays for preprocessing, shared by concurrent calls
+        self.buffers = buffers or ImageBufferPool()
     
     def extract_text(
         self, 
-        image_path: str, 
+        image: Union[str, bytes, Image.Image, np.ndarray], 
         language: str = 'eng',
         config: str = '--psm 6',
-        preprocess: bool = False
+        preprocess: bool = False,
+        max_workers: Optional[int] = None
     ) -> dict:
-        """Extract text from image using Tesseract"""
+        """
+        Extract text from image using Tesseract
+        
+        The image can be a file path, the encoded file contents as bytes,
+        an already opened PIL image or a decoded uint8 array. For PDFs,
+        max_workers is passed on to extract_text_pdf.
+        """
+        
+        if is_pdf(image):
+            return self.extract_text_pdf(image, language, config, preprocess, max_workers)
         
+        preprocessed = None
         try:
             # Load image
             if preprocess:
-                image = self._preprocess_image(image_path)
-            else:
-                image = Image.open(image_path)
+                image = preprocessed = self._preprocess_image(image)
+            elif isinstance(image, bytes):
+                image = Image.open(BytesIO(image))
+            elif not isinstance(image, (Image.Image, np.ndarray)):
+                image = Image.open(image)
             
-            # Extract text
-            text = pytesseract.image_to_string(
-                image, 
-                lang=language, 
-                config=config
-            )
+            pooled = None
+            if self.pool is not None:
+                pooled = self.pool.recognize(image, language, config)
             
-            # Get confidence data
-            data = pytesseract.image_to_data(
-                image, 
-                lang=language, 
-                config=config,
-                output_type=pytesseract.Output.DICT
-            )
+            # Word counts come from Tesseract's own word list (one
+            # confidence per word) rather than splitting the text again
+            if pooled is not None:
+                text, confidences = pooled
+                word_confidences = np.fromiter(confidences, dtype=np.float64, count=len(confidences))
+            else:
+                # One tesseract run gives both the words and their confidences
+                tsv = pytesseract.image_to_data(
+                    image, 
+                    lang=language, 
+                    config=config,
+                    output_type=pytesseract.Output.BYTES
+                )
+                
+                data = data_from_tsv(tsv)
+                text = text_from_data(data)
+                # Only word rows have a confidence; layout rows report -1
+                word_confidences = data['conf'][data['conf'] >= 0]
             
-            # Calculate average confidence
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            word_count = word_confidences.size
+            confident = word_confidences[word_confidences > 0]
+            avg_confidence = float(confident.mean()) if confident.size else 0
             
             return {
                 'text': text.strip(),
                 'confidence': round(avg_confidence, 2),
-                'word_count': len(text.split()),
+                'word_count': word_count,
                 'character_count': len(text),
                 'language': language,
                 'config': config
@@ -83,24 +290,131 @@ class OCRProcessor:
                 'text': '',
                 'confidence': 0
             }
+        finally:
+            if preprocessed is not None:
+                self.buffers.release(preprocessed)
     
-    def _preprocess_image(self, image_path: str) -> Image.Image:
-        """Preprocess image to improve OCR accuracy"""
+    def extract_text_pdf(
+        self,
+        pdf: Union[str, bytes],
+        language: str = 'eng',
+        config: str = '--psm 6',
+        preprocess: bool = False,
+        max_workers: Optional[int] = None
+    ) -> dict:
+        """
+        Extract text from every page of a PDF
         
-        # Read image with OpenCV
-        img = cv2.imread(image_path)
+        Pages are rendered in memory with pdfium and OCR'd max_workers at
+        a time (default: one per CPU). Callers that already OCR several
+        files at once should pass 1. Only the group of pages being OCR'd is
+        held in memory. With preprocess, pages are rendered in grayscale
+        and each group is binarized together (see binarize_pages) before
+        OCR. The result has the same keys as extract_text, with the page
+        texts joined by blank lines, plus a page_count.
+        """
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if not PDFIUM_AVAILABLE:
+            return {
+                'error': 'PDF support requires pypdfium2',
+                'text': '',
+                'confidence': 0
+            }
         
-        # Apply noise reduction
-        denoised = cv2.medianBlur(gray, 5)
+        workers = max_workers or available_cpus()
+        try:
+            # pdfium isn't thread-safe, so render on this thread and only
+            # fan out the OCR
+            document = pdfium.PdfDocument(pdf)
+            results = []
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for start in range(0, len(document), workers):
+                        pages = []
+                        for index in range(start, min(start + workers, len(document))):
+                            page = document[index]
+                            if preprocess:
+                                # Denoise right away; the blur copies the pixels
+                                # out of pdfium's bitmap
+                                bitmap = page.render(scale=PDF_RENDER_SCALE, grayscale=True)
+                                pages.append(cv2.medianBlur(bitmap.to_numpy()[:, :, 0], 5))
+                            else:
+                                pages.append(page.render(scale=PDF_RENDER_SCALE).to_pil())
+                            page.close()
+                        
+                        if preprocess:
+                            pages = binarize_pages(pages)
+                        
+                        results.extend(executor.map(
+                            lambda page: self.extract_text(page, language, config),
+                            pages
+                        ))
+            finally:
+                document.close()
+        except Exception as e:
+            return {
+                'error': str(e),
+                'text': '',
+                'confidence': 0
+            }
+        
+        for number, result in enumerate(results, 1):
+            if 'error' in result:
+                return {
+                    'error': f"Page {number}: {result['error']}",
+                    'text': '',
+                    'confidence': 0
+                }
+        
+        text = '\n\n'.join(result['text'] for result in results)
+        word_count = sum(result['word_count'] for result in results)
+        # Weight page confidences by how many words each page contributed
+        confidence = (
+            sum(result['confidence'] * result['word_count'] for result in results) / word_count
+            if word_count else 0
+        )
+        
+        return {
+            'text': text,
+            'confidence': round(confidence, 2),
+            'word_count': word_count,
+            'character_count': len(text),
+            'language': language,
+            'config': config,
+            'page_count': len(results)
+        }
+    
+    def _preprocess_image(self, image: Union[str, bytes, Image.Image]) -> np.ndarray:
+        """
+        Preprocess image to improve OCR accuracy
+        
+        Returns the binarized image as a 2D uint8 array, which both the
+        engine pool and pytesseract take directly. The array comes from
+        self.buffers; extract_text releases it once OCR is done.
+        """
+        
+        # Read straight into grayscale; the decoder converts as it goes, so
+        # no full-size color copy is made
+        if isinstance(image, Image.Image):
+            gray = np.asarray(image.convert('L'))
+        else:
+            data = np.frombuffer(image, np.uint8) if isinstance(image, bytes) else np.fromfile(image, np.uint8)
+            gray = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE) if data.size else None
         
-        # Apply thresholding
-        _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if gray is None:
+            raise ValueError("Could not decode image")
         
-        # Convert back to PIL Image
-        return Image.fromarray(thresh)
+        # Apply noise reduction into a pooled buffer; the decoded image then
+        # serves as the buffer for a later image of the same size
+        denoised = cv2.medianBlur(gray, 5, dst=self.buffers.acquire(gray.shape, gray.dtype))
+        self.buffers.release(gray)
+        
+        # Apply thresholding in place
+        _, thresh = cv2.threshold(
+            denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=denoised
+        )
+        
+        return thresh
     
     def get_available_languages(self) -> List[str]:
         """Get list of available Tesseract languages"""
@@ -251,15 +565,7 @@ Examples:
             else:
                 print("Available Gemini tasks (API key required to test connection):")
                 # Show tasks without testing connection
-                tasks = {
-                    "analyze": "Analyze document structure and content",
-                    "summarize": "Create a concise summary",
-                    "structure": "Clean and organize the text",
-                    "extract": "Extract key information and data",
-                    "translate": "Detect language and translate to English",
-                    "validate": "Validate and fact-check information",
-                    "format": "Format into professional document"
-                }
+                tasks = TASK_DESCRIPTIONS
                 for task, description in tasks.items():
                     print(f"  {task:<12} - {description}")
         except Exception as e:
@@ -275,10 +581,7 @@ Examples:
         sys.exit(1)
     
     # Check if it's an image file
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif', '.webp'}
-    file_ext = Path(args.input_file).suffix.lower()
-    
-    if file_ext not in image_extensions:
+    if not (is_image_name(os.path.basename(args.input_file)) or is_pdf(args.input_file)):
         print(f"Warning: '{args.input_file}' may not be a supported image format", file=sys.stderr)
     
     if args.verbose:
@@ -356,7 +659,10 @@ Examples:
             if gemini_result:
                 output += f"\n\n--- Gemini Info ---"
                 if gemini_result['success']:
-                    usage = gemini_result.get('usage', {})
+                    usage = {
+                        name: 'N/A' if count is None else count
+                        for name, count in gemini_result.get('usage', {}).items()
+                    }
                     output += f"\nTask: {gemini_result['task']}"
                     output += f"\nPrompt tokens: {usage.get('prompt_tokens', 'N/A')}"
                     output += f"\nCompletion tokens: {usage.get('completion_tokens', 'N/A')}"
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for serving the API in production
+
+    gunicorn -c gunicorn.conf.py api:app
+
+Each worker is a separate process running Uvicorn's event loop, so CPU
+work in one worker never waits on another worker's GIL. `python api.py`
+remains the development entry point (with auto-reload when DEBUG=true).
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('API_PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Import the app once in the master so workers share the loaded modules and
+# warmed OCR engines copy-on-write instead of each initializing their own
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+
+# Split the machine's OCR capacity between workers rather than letting
+# every worker size OCR_CONCURRENCY to all cores
+os.environ.setdefault('OCR_CONCURRENCY', str(max(1, multiprocessing.cpu_count() // workers)))
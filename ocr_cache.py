@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+OCR Gaby result store - OCR results kept on disk between batch runs
+
+Re-running the batch CLI over the same directory would otherwise OCR every
+file again. ResultStore keeps each result in a local SQLite database keyed
+by the file's content hash plus every option that affects the output, so
+unchanged files are skipped on later runs. Like the API's Redis cache it
+fails open: database errors just mean the file is OCR'd as usual.
+
+Every write commits on its own and the database runs in WAL mode, so
+several batch runs or a daemon can share one store without waiting on
+each other's transactions.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'ocr-gaby',
+    'results.sqlite3'
+)
+
+# Seconds to wait for another process's write before giving up on one
+BUSY_TIMEOUT = 0.1
+
+
+class ResultStore:
+    """
+    SQLite-backed store of OCR results
+    
+    Safe to call from several threads; callers on an event loop should use
+    asyncio.to_thread, since a busy database can block for BUSY_TIMEOUT.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, timeout: float = BUSY_TIMEOUT):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit: no transaction stays open between calls
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL)')
+
+    @staticmethod
+    def key(digest: str, language: str, config: str, preprocess: bool, engine: str = '') -> str:
+        """
+        Key for the OCR result of a file with the given content hash
+        
+        engine identifies the Tesseract build and traineddata (see
+        cli.engine_identity), so results from before an upgrade are not
+        reused.
+        """
+        options = f"|{language}|{config}|{preprocess}|{engine}".encode()
+        return digest + ':' + hashlib.blake2b(options, digest_size=8).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a stored result, or None on a miss or database error"""
+        try:
+            with self._lock:
+                row = self.db.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result; skipped if the database stays locked"""
+        try:
+            with self._lock:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO results (key, result) VALUES (?, ?)',
+                    (key, json.dumps(result, ensure_ascii=False))
+                )
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+OCR Gaby batch client - run a batch on a batch_cli daemon
+
+Start the daemon once with
+
+    python batch_cli.py --daemon /tmp/ocr-gaby.sock --workers 4
+
+and it keeps Tesseract engines, the result cache and the Gemini client
+loaded between batches. This client only imports the standard library, so
+it starts in a fraction of the time batch_cli needs to import OpenCV,
+NumPy and Tesseract. It prints the same JSON document batch_cli does.
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='OCR Gaby Batch Client - Process images on a running batch_cli daemon',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s /tmp/ocr-gaby.sock /path/to/images/
+  %(prog)s /tmp/ocr-gaby.sock image1.jpg image2.png --output results.json
+  %(prog)s /tmp/ocr-gaby.sock /path/to/images/ --gemini --gemini-task extract
+        """
+    )
+
+    parser.add_argument('socket', help='Unix socket the daemon listens on')
+    parser.add_argument('inputs', nargs='+', help='Input files or directories')
+    parser.add_argument('-l', '--language', help="Tesseract language code (default: the daemon's)")
+    parser.add_argument('-c', '--config', help="Tesseract configuration (default: the daemon's)")
+    parser.add_argument('-o', '--output', help='Output JSON file path')
+    parser.add_argument('-p', '--preprocess', action='store_true', help='Apply image preprocessing')
+    parser.add_argument('-r', '--recursive', action='store_true', help='Process directories recursively')
+    parser.add_argument(
+        '--continue-on-error',
+        action='store_true',
+        help='Exit successfully even if some files fail'
+    )
+    parser.add_argument('--gemini', action='store_true', help='Process OCR results with Gemini LLM')
+    parser.add_argument('--gemini-task', help='Predefined Gemini task (default: analyze)')
+    parser.add_argument('--gemini-prompt', help='Custom prompt for Gemini processing')
+    parser.add_argument('--gemini-temperature', type=float, help='Gemini response creativity 0.0-1.0')
+    parser.add_argument('--gemini-max-tokens', type=int, help='Maximum tokens in Gemini response')
+    parser.add_argument('--gemini-batch-size', type=int, help='Send the texts of this many files to Gemini in one request')
+
+    args = parser.parse_args()
+
+    # The daemon has its own working directory
+    inputs = []
+    for input_path in args.inputs:
+        if os.path.exists(input_path):
+            inputs.append(os.path.abspath(input_path))
+        else:
+            print(f"Warning: {input_path} not found", file=sys.stderr)
+
+    if not inputs:
+        print("No files to process", file=sys.stderr)
+        sys.exit(1)
+
+    job = {
+        'inputs': inputs,
+        'preprocess': args.preprocess,
+        'recursive': args.recursive,
+        'gemini': args.gemini
+    }
+    for name in ['language', 'config', 'gemini_task', 'gemini_prompt',
+                 'gemini_temperature', 'gemini_max_tokens', 'gemini_batch_size']:
+        if getattr(args, name) is not None:
+            job[name] = getattr(args, name)
+
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(args.socket)
+    except OSError as e:
+        print(f"Error: cannot connect to daemon at {args.socket}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # Results arrive one JSON line each and are copied into the document
+    # as they are; only the final summary line is re-encoded
+    out = io.BytesIO()
+    out.write(b'{\n  "results": [')
+    count = 0
+    message = {}
+    with sock, sock.makefile('rb') as lines:
+        sock.sendall(json.dumps(job).encode() + b'\n')
+        for line in lines:
+            message = json.loads(line)
+            if 'file_path' not in message:
+                break
+            out.write((b',\n    ' if count else b'\n    ') + line.rstrip(b'\n'))
+            count += 1
+
+    if 'summary' not in message:
+        print(f"Error: {message.get('error', 'daemon closed the connection')}", file=sys.stderr)
+        sys.exit(1)
+
+    failed_files = message['failed_files']
+    if failed_files and not args.continue_on_error:
+        print(f"Error processing {failed_files[0]['file']}: {failed_files[0]['error']}", file=sys.stderr)
+        sys.exit(1)
+
+    out.write(b'\n  ]' if count else b']')
+    for name in ['summary', 'failed_files']:
+        if message[name]:
+            encoded = json.dumps(message[name], indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            out.write(f',\n  "{name}": {encoded}'.encode('utf-8'))
+    out.write(b'\n}\n')
+
+    if args.output:
+        try:
+            with open(args.output, 'wb') as f:
+                f.write(out.getvalue())
+            print(f"Results saved to: {args.output}")
+        except OSError as e:
+            print(f"Error saving results: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        sys.stdout.buffer.write(out.getvalue())
+
+
+if __name__ == '__main__':
+    main()
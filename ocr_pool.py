@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+OCR Gaby engine pool - persistent Tesseract engines shared across requests
+
+Loading a Tesseract language model takes longer than recognizing a small
+image, and pytesseract pays that cost on every call by spawning a new
+process. TesseractPool keeps initialized tesserocr engines alive and checks
+them out per call instead.
+"""
+
+import os
+import shlex
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import Empty, Full, Queue
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Single-threaded engines; the pool provides the parallelism (see cli.py)
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+try:
+    from tesserocr import OEM, PSM, PyTessBaseAPI
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# (language, psm, oem, variables) - engines are only reused for identical settings
+EngineKey = Tuple[str, int, int, Tuple[Tuple[str, str], ...]]
+
+# Distinct settings kept loaded at once; language and config come from
+# clients, so without a cap every new -c variable would load more models
+MAX_CONFIGS = 4
+
+# Idle preprocessing buffers kept in total, and the largest one worth
+# keeping; an occasional huge scan shouldn't stay resident after its OCR
+MAX_IDLE_BUFFER_BYTES = 256 * 1024 * 1024
+MAX_POOLED_BUFFER_BYTES = 64 * 1024 * 1024
+
+
+def parse_tesseract_config(config: str) -> Optional[Tuple[int, int, Dict[str, str]]]:
+    """
+    Translate a tesseract command line config into engine settings
+
+    Supports --psm, --oem and -c name=value. Returns None when the config
+    uses anything else, so callers can fall back to the tesseract binary.
+    """
+    psm = PSM.AUTO
+    oem = OEM.DEFAULT
+    variables = {}
+
+    tokens = shlex.split(config)
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        value = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token == '--psm' and value is not None and value.isdigit():
+            psm = int(value)
+        elif token == '--oem' and value is not None and value.isdigit():
+            oem = int(value)
+        elif token == '-c' and value is not None and '=' in value:
+            name, _, setting = value.partition('=')
+            variables[name] = setting
+        else:
+            return None
+        i += 2
+
+    return psm, oem, variables
+
+
+class TesseractPool:
+    """
+    Bounded pool of pre-initialized tesserocr engines
+    
+    Engines are kept for at most max_configs distinct settings. A new
+    setting evicts the least recently used one whose engines are all idle;
+    if every setting is busy, callers fall back to the tesseract binary.
+    """
+
+    def __init__(self, size: int, path: Optional[str] = None, max_configs: int = MAX_CONFIGS):
+        if not TESSEROCR_AVAILABLE:
+            raise RuntimeError("tesserocr is not installed")
+
+        self.size = size
+        self.path = path
+        self.max_configs = max_configs
+        self._queues: 'OrderedDict[EngineKey, Queue]' = OrderedDict()
+        self._created: Dict[EngineKey, int] = {}
+        # Callers blocked waiting for an engine; their settings aren't evicted
+        self._waiting: Dict[EngineKey, int] = {}
+        self._lock = threading.Lock()
+
+    def warm(self, language: str = 'eng', config: str = '--psm 6'):
+        """Initialize engines for a language/config up front"""
+        settings = parse_tesseract_config(config)
+        if settings is None:
+            return
+
+        engines = [self.acquire(language, *settings) for _ in range(self.size)]
+        for engine in engines:
+            if engine is not None:
+                self.release(engine, language, *settings)
+
+    def acquire(
+        self,
+        language: str,
+        psm: int,
+        oem: int,
+        variables: Dict[str, str]
+    ) -> Optional['PyTessBaseAPI']:
+        """
+        Check out an engine for the given settings
+
+        Engines are created lazily up to the pool size; after that callers
+        block until another caller releases one. Returns None when the
+        settings are new and no other settings can be evicted.
+        """
+        key = self._key(language, psm, oem, variables)
+
+        with self._lock:
+            engines = self._queues.get(key)
+            if engines is None:
+                if len(self._queues) >= self.max_configs and not self._evict_idle():
+                    return None
+                engines = self._queues[key] = Queue(maxsize=self.size)
+            self._queues.move_to_end(key)
+            try:
+                return engines.get_nowait()
+            except Empty:
+                create = self._created.get(key, 0) < self.size
+                if create:
+                    self._created[key] = self._created.get(key, 0) + 1
+                else:
+                    self._waiting[key] = self._waiting.get(key, 0) + 1
+
+        if not create:
+            try:
+                return engines.get()
+            finally:
+                with self._lock:
+                    self._waiting[key] -= 1
+                    if not self._waiting[key]:
+                        del self._waiting[key]
+
+        try:
+            kwargs = {'lang': language, 'psm': psm, 'oem': oem, 'variables': variables}
+            if self.path:
+                kwargs['path'] = self.path
+            return PyTessBaseAPI(**kwargs)
+        except Exception:
+            with self._lock:
+                self._created[key] -= 1
+            raise
+
+    def release(
+        self,
+        engine: 'PyTessBaseAPI',
+        language: str,
+        psm: int,
+        oem: int,
+        variables: Dict[str, str]
+    ):
+        """Return an engine to the pool, or end it if its settings are gone (after close())"""
+        engine.Clear()
+        with self._lock:
+            engines = self._queues.get(self._key(language, psm, oem, variables))
+            if engines is not None:
+                try:
+                    engines.put_nowait(engine)
+                    return
+                except Full:
+                    pass
+        engine.End()
+
+    @contextmanager
+    def engine(self, language: str, psm: int, oem: int, variables: Dict[str, str]):
+        """Context manager around acquire()/release(); yields None like acquire()"""
+        engine = self.acquire(language, psm, oem, variables)
+        try:
+            yield engine
+        finally:
+            if engine is not None:
+                self.release(engine, language, psm, oem, variables)
+
+    def recognize(self, image, language: str, config: str) -> Optional[Tuple[str, List[int]]]:
+        """
+        OCR a PIL image or uint8 array with a pooled engine
+
+        Arrays are handed to Tesseract as raw pixels; PIL images go through
+        tesserocr's encode/decode round trip.
+
+        Returns the text and per-word confidences, or None if the config
+        can't be expressed as engine settings or no engine slot is free
+        for it.
+        """
+        settings = parse_tesseract_config(config)
+        if settings is None:
+            return None
+
+        with self.engine(language, *settings) as engine:
+            if engine is None:
+                return None
+            if isinstance(image, np.ndarray):
+                pixels = np.ascontiguousarray(image)
+                height, width = pixels.shape[:2]
+                channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+                # Tesseract doesn't copy the buffer; keep it referenced until
+                # recognition is done
+                data = pixels.tobytes()
+                engine.SetImageBytes(data, width, height, channels, width * channels)
+            else:
+                engine.SetImage(image)
+            text = engine.GetUTF8Text()
+            confidences = engine.AllWordConfidences()
+
+        return text, confidences
+
+    def close(self):
+        """Shut down every idle engine"""
+        with self._lock:
+            for engines in self._queues.values():
+                while True:
+                    try:
+                        engines.get_nowait().End()
+                    except Empty:
+                        break
+            self._queues.clear()
+            self._created.clear()
+
+    def _evict_idle(self) -> bool:
+        # Called with the lock held; oldest settings come first
+        for key, engines in self._queues.items():
+            if key not in self._waiting and engines.qsize() == self._created.get(key, 0):
+                while True:
+                    try:
+                        engines.get_nowait().End()
+                    except Empty:
+                        break
+                del self._queues[key]
+                self._created.pop(key, None)
+                return True
+        return False
+
+    @staticmethod
+    def _key(language: str, psm: int, oem: int, variables: Dict[str, str]) -> EngineKey:
+        return (language, int(psm), int(oem), tuple(sorted(variables.items())))
+
+
+class ImageBufferPool:
+    """
+    Reusable image-sized scratch arrays
+    
+    Preprocessing needs a full-size buffer per image. Scans in a batch are
+    mostly the same size, so buffers released after OCR are handed out
+    again instead of allocating new ones. At most max_idle buffers and
+    max_idle_bytes are kept, dropping the least recently released sizes
+    first; buffers larger than max_buffer_bytes are never kept.
+    """
+
+    def __init__(
+        self,
+        max_idle: int = 8,
+        max_idle_bytes: int = MAX_IDLE_BUFFER_BYTES,
+        max_buffer_bytes: int = MAX_POOLED_BUFFER_BYTES
+    ):
+        self.max_idle = max_idle
+        self.max_idle_bytes = max_idle_bytes
+        self.max_buffer_bytes = max_buffer_bytes
+        self._idle: 'OrderedDict[Tuple[Tuple[int, ...], str], List[np.ndarray]]' = OrderedDict()
+        self._count = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Get an uninitialized array of the given shape and dtype"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            buffers = self._idle.get(key)
+            if buffers:
+                self._count -= 1
+                buffer = buffers.pop()
+                self._bytes -= buffer.nbytes
+                if not buffers:
+                    del self._idle[key]
+                return buffer
+        return np.empty(shape, dtype)
+
+    def release(self, buffer: np.ndarray):
+        """Return an array for reuse; views, read-only and oversized arrays are ignored"""
+        if not (buffer.flags.writeable and buffer.flags.owndata):
+            return
+        if buffer.nbytes > min(self.max_buffer_bytes, self.max_idle_bytes):
+            return
+
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            self._idle.setdefault(key, []).append(buffer)
+            self._idle.move_to_end(key)
+            self._count += 1
+            self._bytes += buffer.nbytes
+            while self._count > self.max_idle or self._bytes > self.max_idle_bytes:
+                oldest, buffers = next(iter(self._idle.items()))
+                self._bytes -= buffers.pop().nbytes
+                self._count -= 1
+                if not buffers:
+                    del self._idle[oldest]
+
+
+def create_pool(
+    size: int,
+    language: str = 'eng',
+    config: str = '--psm 6',
+    path: Optional[str] = None
+) -> Optional[TesseractPool]:
+    """
+    Build a pool with engines for language/config initialized up front
+    
+    Returns None when tesserocr isn't installed or the engines can't be
+    initialized (e.g. missing traineddata), so callers fall back to the
+    tesseract binary.
+    """
+    if not TESSEROCR_AVAILABLE:
+        return None
+
+    pool = TesseractPool(size, path)
+    try:
+        pool.warm(language, config)
+    except RuntimeError as e:
+        print(f"Warning: could not preload Tesseract engines, using tesseract binary: {e}", file=sys.stderr)
+        pool.close()
+        return None
+    return pool
@@ -47,12 +47,19 @@ cat > "$INSTALL_PREFIX/ocr-gaby-batch" << EOF
 python3 "$SCRIPT_DIR/batch_cli.py" "\$@"
 EOF
 
+cat > "$INSTALL_PREFIX/ocr-gaby-client" << EOF
+#!/bin/bash
+python3 "$SCRIPT_DIR/ocr_client.py" "\$@"
+EOF
+
 # Make executable
 chmod +x "$INSTALL_PREFIX/ocr-gaby"
 chmod +x "$INSTALL_PREFIX/ocr-gaby-batch"
+chmod +x "$INSTALL_PREFIX/ocr-gaby-client"
 
 echo -e "${GREEN}✓ Installed ocr-gaby to $INSTALL_PREFIX/ocr-gaby${NC}"
 echo -e "${GREEN}✓ Installed ocr-gaby-batch to $INSTALL_PREFIX/ocr-gaby-batch${NC}"
+echo -e "${GREEN}✓ Installed ocr-gaby-client to $INSTALL_PREFIX/ocr-gaby-client${NC}"
 
 # Check Tesseract installation
 echo -e "\n${GREEN}Checking Tesseract installation...${NC}"
@@ -0,0 +1,465 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+import api
+from app.cache import ResultCache
+from app.sessions import UploadSessionStore
+
+client = TestClient(api.app)
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """Replace Tesseract with a stub so endpoints can run without it"""
+    calls = []
+
+    def extract_text(image, language='eng', config='--psm 6', preprocess=False, max_workers=None):
+        if isinstance(image, bytes):
+            content = image
+        else:
+            with open(image, 'rb') as f:
+                content = f.read()
+        calls.append({
+            'image': image,
+            'content': content,
+            'language': language,
+            'preprocess': preprocess
+        })
+        return {
+            'text': 'hello world',
+            'confidence': 90.0,
+            'word_count': 2,
+            'character_count': 11,
+            'language': language,
+            'config': config
+        }
+
+    monkeypatch.setattr(api.ocr_processor, 'extract_text', extract_text)
+    return calls
+
+
+@pytest.fixture
+def session_client(monkeypatch):
+    """Client whose upload sessions and result cache live in an in-process fake Redis
+
+    The context-managed client keeps a single event loop for the whole
+    test, which the async Redis connection requires.
+    """
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(api, 'upload_sessions', UploadSessionStore(redis))
+    monkeypatch.setattr(api, 'result_cache', ResultCache(redis))
+    with TestClient(api.app) as session_client:
+        yield session_client
+
+
+def test_health_check():
+    """Test health check endpoint"""
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+def test_ocr_no_file():
+    """Test OCR endpoint without file"""
+    response = client.post("/ocr")
+    assert response.status_code == 400
+    assert response.json() == {'success': False, 'error': 'No file provided'}
+
+
+def test_ocr_wrong_file_type():
+    """Test OCR endpoint with a disallowed extension"""
+    response = client.post(
+        "/ocr",
+        files={"file": ("notes.txt", b"test content", "text/plain")}
+    )
+    assert response.status_code == 400
+    assert "File type not allowed" in response.json()["error"]
+
+
+def test_ocr_success(fake_ocr):
+    """Test OCR endpoint passes form options through"""
+    response = client.post(
+        "/ocr",
+        files={"file": ("scan.png", b"fake image bytes", "image/png")},
+        data={"language": "spa", "preprocess": "true"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert body["data"]["text"] == "hello world"
+    assert fake_ocr[0]["language"] == "spa"
+    assert fake_ocr[0]["preprocess"] is True
+
+
+def test_ocr_rejects_non_utf8_fields(fake_ocr):
+    """Test a form field that isn't UTF-8 is a bad request, not a server error"""
+    body = (
+        b'--x\r\nContent-Disposition: form-data; name="language"\r\n\r\n\xff\xfe\r\n'
+        b'--x\r\nContent-Disposition: form-data; name="file"; filename="scan.png"\r\n'
+        b'Content-Type: image/png\r\n\r\nfake image bytes\r\n--x--\r\n'
+    )
+    response = client.post(
+        "/ocr",
+        content=body,
+        headers={"Content-Type": "multipart/form-data; boundary=x"}
+    )
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["error"]
+    assert not fake_ocr
+
+
+def test_ocr_reads_upload_in_memory(fake_ocr):
+    """Test the upload is handed to OCR as bytes, not a temp file"""
+    response = client.post(
+        "/ocr",
+        files={"file": ("scan.png", b"fake image bytes", "image/png")}
+    )
+    assert response.status_code == 200
+    assert fake_ocr[0]["image"] == b"fake image bytes"
+
+
+def test_ocr_results_are_cached(fake_ocr, session_client):
+    """Test identical uploads with identical options are only OCR'd once"""
+    for language in ['eng', 'eng', 'spa']:
+        response = session_client.post(
+            "/ocr",
+            files={"file": ("scan.png", b"same bytes", "image/png")},
+            data={"language": language}
+        )
+        assert response.status_code == 200
+        assert response.json()["data"]["text"] == "hello world"
+    assert [call["language"] for call in fake_ocr] == ['eng', 'spa']
+
+
+def test_batch_reports_failures(fake_ocr):
+    """Test batch endpoint processes allowed files and reports the rest"""
+    response = client.post(
+        "/batch/ocr",
+        files=[
+            ("files", ("a.png", b"one", "image/png")),
+            ("files", ("b.txt", b"two", "text/plain")),
+        ]
+    )
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["total"] == 2
+    assert data["processed"] == 1
+    assert data["failures"][0]["filename"] == "b.txt"
+
+
+def test_batch_gemini_runs_concurrently(fake_ocr, monkeypatch):
+    """Test batch Gemini requests are in flight at the same time"""
+    import asyncio
+    in_flight = []
+    peak = []
+
+    async def process_with_gemini(request, api_key, text, task='analyze', **options):
+        in_flight.append(text)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return {'success': True, 'response': 'ok', 'task': task}
+
+    monkeypatch.setattr(api, 'process_with_gemini', process_with_gemini)
+    monkeypatch.setattr(api, 'GEMINI_AVAILABLE', True)
+    monkeypatch.setenv('GEMINI_API_KEY', 'key')
+
+    response = client.post(
+        "/batch/ocr",
+        files=[("files", (f"{i}.png", bytes([i]), "image/png")) for i in range(3)],
+        data={"use_gemini": "true"}
+    )
+    assert response.status_code == 200
+    results = response.json()["data"]["results"]
+    assert [result["gemini"]["response"] for result in results] == ["ok"] * 3
+    assert max(peak) == 3
+
+
+def test_batch_gemini_overlaps_ocr(monkeypatch):
+    """Test a file's Gemini step starts while other files are still in OCR"""
+    import asyncio
+    events = []
+
+    async def run_ocr(image, **options):
+        await asyncio.sleep(0.05 if image == b"slow" else 0)
+        events.append(('ocr', image))
+        return {'text': image.decode()}
+
+    async def process_with_gemini(request, api_key, text, task='analyze', **options):
+        events.append(('gemini', text))
+        return {'success': True, 'response': text, 'task': task}
+
+    monkeypatch.setattr(api, 'run_ocr', run_ocr)
+    monkeypatch.setattr(api, 'process_with_gemini', process_with_gemini)
+    monkeypatch.setattr(api, 'GEMINI_AVAILABLE', True)
+    monkeypatch.setenv('GEMINI_API_KEY', 'key')
+
+    response = client.post(
+        "/batch/ocr",
+        files=[
+            ("files", ("slow.png", b"slow", "image/png")),
+            ("files", ("fast.png", b"fast", "image/png")),
+        ],
+        data={"use_gemini": "true"}
+    )
+    assert response.status_code == 200
+    assert events.index(('gemini', 'fast')) < events.index(('ocr', b'slow'))
+
+
+def test_chunked_upload_flow(fake_ocr, session_client, monkeypatch):
+    """Test chunks sent out of order land at their own offsets"""
+    monkeypatch.setattr(api, 'CHUNK_SIZE', 3)
+    response = session_client.post(
+        "/upload/init",
+        json={"filename": "big.png", "filesize": 6, "chunk_count": 2}
+    )
+    assert response.status_code == 200
+    upload_id = response.json()["upload_id"]
+
+    for index, payload in [(1, b"def"), (0, b"abc")]:
+        response = session_client.post(
+            f"/upload/chunk/{upload_id}?chunk_index={index}",
+            content=payload
+        )
+        assert response.status_code == 200
+    assert response.json()["is_complete"] is True
+
+    response = session_client.post(f"/upload/complete/{upload_id}")
+    assert response.status_code == 200
+    assert response.json()["data"]["ocr"]["text"] == "hello world"
+    assert fake_ocr[0]["content"] == b"abcdef"
+
+
+def test_chunked_upload_retry_counts_once(session_client, monkeypatch):
+    """Test a re-sent chunk is not counted twice"""
+    monkeypatch.setattr(api, 'CHUNK_SIZE', 3)
+    response = session_client.post(
+        "/upload/init",
+        json={"filename": "big.png", "filesize": 6, "chunk_count": 2}
+    )
+    upload_id = response.json()["upload_id"]
+
+    for _ in range(2):
+        response = session_client.post(
+            f"/upload/chunk/{upload_id}?chunk_index=0",
+            content=b"abc"
+        )
+    assert response.json()["received"] == 1
+    assert response.json()["is_complete"] is False
+
+    response = session_client.post(
+        f"/upload/chunk/{upload_id}?chunk_index=1",
+        content=b"defg"
+    )
+    assert response.status_code == 400
+    session_client.delete(f"/upload/cancel/{upload_id}")
+
+
+def test_chunked_upload_invalid_session(session_client):
+    """Test chunk upload against an unknown session"""
+    response = session_client.delete("/upload/cancel/does-not-exist")
+    assert response.status_code == 400
+    assert response.json()["error"] == "Invalid upload session"
+
+
+def test_gemini_background_job(fake_ocr, monkeypatch):
+    """Test background Gemini requests are queued and can be polled"""
+    from rq import Queue
+    queue = Queue('gemini', connection=fakeredis.FakeStrictRedis())
+    monkeypatch.setattr(api, 'gemini_queue', queue)
+    monkeypatch.setattr(api, 'GEMINI_AVAILABLE', True)
+
+    response = client.post(
+        "/ocr/gemini",
+        files={"file": ("scan.png", b"fake image bytes", "image/png")},
+        data={"gemini_api_key": "key", "background": "true"}
+    )
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "pending"
+    assert body["data"]["ocr"]["text"] == "hello world"
+    assert len(queue) == 1
+
+    # The API key is kept apart from the job's stored arguments
+    job = queue.jobs[0]
+    assert "key" not in job.args and "api_key" not in job.kwargs
+    assert queue.connection.get(job.kwargs["api_key_ref"]) == b"key"
+
+    response = client.get(f"/jobs/{body['job_id']}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+    response = client.get("/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "http://127.0.0.1:6379/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "http://[::1]/hook",
+    "http://localhost/hook",
+])
+def test_gemini_rejects_bad_callback_url(fake_ocr, monkeypatch, url):
+    """Test callback URLs must be http(s) and can't point at internal hosts"""
+    monkeypatch.setattr(api, 'GEMINI_AVAILABLE', True)
+    response = client.post(
+        "/ocr/gemini",
+        files={"file": ("scan.png", b"fake image bytes", "image/png")},
+        data={"gemini_api_key": "key", "callback_url": url}
+    )
+    assert response.status_code == 400
+
+
+def test_callback_url_allowlist(monkeypatch):
+    """Test CALLBACK_ALLOWED_HOSTS replaces the public address check"""
+    from app.tasks import settings, valid_callback_url
+    assert valid_callback_url("https://93.184.215.14/hook")
+
+    monkeypatch.setattr(settings, 'CALLBACK_ALLOWED_HOSTS', ['hooks.internal'])
+    assert valid_callback_url("https://Hooks.Internal/done")
+    assert not valid_callback_url("https://93.184.215.14/hook")
+
+
+def test_gemini_job_takes_its_api_key(monkeypatch):
+    """Test a job reads its stashed API key once and deletes it"""
+    import app.gemini
+    import app.tasks
+    from types import SimpleNamespace
+    connection = fakeredis.FakeStrictRedis()
+    used_keys = []
+
+    class FakeGemini:
+        def process_text(self, text, **options):
+            return {'success': True, 'response': text}
+
+    def get_gemini(api_key):
+        used_keys.append(api_key)
+        return FakeGemini()
+
+    monkeypatch.setattr(app.gemini, 'get_gemini', get_gemini)
+    monkeypatch.setattr(app.tasks, 'get_current_job', lambda: SimpleNamespace(id='job', connection=connection))
+    ref = app.tasks.stash_api_key(connection, 'secret')
+    assert connection.ttl(ref) > 0
+
+    assert app.tasks.run_gemini('text', api_key_ref=ref)['response'] == 'text'
+    assert used_keys == ['secret']
+    assert connection.get(ref) is None
+
+
+def test_buffer_pool_reuses_buffers():
+    """Test released buffers are handed out again, and stale sizes dropped"""
+    from app.uploads import BufferPool
+    pool = BufferPool(2)
+    buffer = pool.acquire(4)
+    pool.release(buffer)
+    assert pool.acquire(4) is buffer
+    pool.release(buffer)
+    assert len(pool.acquire(8)) == 8
+
+
+@pytest.mark.parametrize("path", ["/ocr", "/upload/complete/does-not-exist"])
+def test_adversarial_content_type_is_fast(path):
+    """Test a backtracking-prone Content-Type header can't stall a worker"""
+    import time
+    content_type = 'application/x-www-form-urlencoded; !="' + '\\' * 64
+    started = time.monotonic()
+    response = client.post(path, content=b"a=b", headers={"Content-Type": content_type})
+    assert response.status_code in (400, 422, 500)
+    assert time.monotonic() - started < 2
+
+
+@pytest.mark.parametrize('init', [
+    {"filesize": "6", "chunk_count": 2},
+    {"filesize": 6, "chunk_count": 2.0},
+    {"filesize": 6, "chunk_count": 3},
+    {"filesize": 0, "chunk_count": 0},
+    {"filesize": api.MAX_FILE_SIZE + 1, "chunk_count": -(-(api.MAX_FILE_SIZE + 1) // api.CHUNK_SIZE)},
+])
+def test_chunked_upload_rejects_bad_init(session_client, monkeypatch, init):
+    """Test sizes must be integers, within bounds and agree with each other"""
+    monkeypatch.setattr(api, 'CHUNK_SIZE', 3)
+    response = session_client.post("/upload/init", json={"filename": "big.png", **init})
+    assert response.status_code == 400
+
+
+def test_chunked_upload_rejects_wrong_chunk_length(session_client, monkeypatch):
+    """Test chunks must fill their slot exactly, and the last stays in the file"""
+    monkeypatch.setattr(api, 'CHUNK_SIZE', 3)
+    response = session_client.post(
+        "/upload/init",
+        json={"filename": "big.png", "filesize": 5, "chunk_count": 2}
+    )
+    upload_id = response.json()["upload_id"]
+
+    for index, payload in [(0, b"ab"), (1, b"def"), (1, b"d")]:
+        response = session_client.post(
+            f"/upload/chunk/{upload_id}?chunk_index={index}",
+            content=payload
+        )
+        assert response.status_code == 400
+    response = session_client.post(f"/upload/chunk/{upload_id}?chunk_index=1", content=b"de")
+    assert response.status_code == 200
+    session_client.delete(f"/upload/cancel/{upload_id}")
+
+
+def test_stale_upload_files_are_removed(tmp_path):
+    """Test only upload files older than the session TTL are swept"""
+    import os
+    import time
+    import uuid
+    stale = tmp_path / f'upload_{uuid.uuid4()}'
+    fresh = tmp_path / f'upload_{uuid.uuid4()}'
+    unrelated = tmp_path / 'upload_notes.txt'
+    for path in [stale, fresh, unrelated]:
+        path.write_bytes(b'x')
+    old = time.time() - 7200
+    for path in [stale, unrelated]:
+        os.utime(path, (old, old))
+
+    api.remove_stale_uploads(tmp_path, 3600)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([fresh.name, unrelated.name])
+
+
+def test_chunked_upload_init_cleans_up_when_session_fails(session_client, monkeypatch, tmp_path):
+    """Test the preallocated file is removed if the session can't be stored"""
+    async def create(upload_id, **fields):
+        raise ConnectionError('redis is down')
+
+    monkeypatch.setattr(api, 'UPLOAD_FOLDER', tmp_path)
+    monkeypatch.setattr(api.upload_sessions, 'create', create)
+    response = session_client.post(
+        "/upload/init",
+        json={"filename": "big.png", "filesize": 6, "chunk_count": 1}
+    )
+    assert response.status_code == 500
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_result_cache_fails_fast_without_redis():
+    """Test an unreachable Redis is a quick cache miss, not a stalled request"""
+    import asyncio
+    import socket
+    import time
+    from app.cache import cache_redis
+
+    # A listener that accepts but never answers, like a blackholed Redis
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    port = listener.getsockname()[1]
+
+    async def lookup():
+        cache = ResultCache(cache_redis(f'redis://127.0.0.1:{port}', timeout=0.2))
+        try:
+            return await cache.get('ocr:missing')
+        finally:
+            await cache.redis.aclose()
+
+    start = time.monotonic()
+    try:
+        assert asyncio.run(lookup()) is None
+    finally:
+        listener.close()
+    assert time.monotonic() - start < 2
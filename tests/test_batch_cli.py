@@ -0,0 +1,492 @@
+import asyncio
+import io
+import json
+import os
+import threading
+from argparse import Namespace
+
+import pytest
+
+from batch_cli import ResultWriter, run_batch
+from cli import OCRProcessor
+
+
+def make_args(**overrides):
+    options = dict(
+        language='eng',
+        config='--psm 6',
+        preprocess=False,
+        workers=2,
+        verbose=False,
+        continue_on_error=True
+    )
+    options.update(overrides)
+    return Namespace(**options)
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    """OCRProcessor whose extract_text reports the file name as its text"""
+    processor = OCRProcessor()
+    running = []
+    peak = []
+
+    def extract_text(image, language='eng', config='--psm 6', preprocess=False, max_workers=None):
+        running.append(image)
+        peak.append(len(running))
+        try:
+            if 'bad' in image:
+                return {'error': 'unreadable', 'text': '', 'confidence': 0}
+            return {'text': image, 'confidence': 90.0, 'word_count': 1}
+        finally:
+            running.remove(image)
+
+    monkeypatch.setattr(processor, 'extract_text', extract_text)
+    processor.peak = peak
+    return processor
+
+
+def test_run_batch_collects_results_and_failures(ocr):
+    """Test every file is processed and failures are reported by path"""
+    files = ['a.png', 'bad.png', 'c.png']
+    out = io.BytesIO()
+    writer = ResultWriter(out)
+    successful, failed = asyncio.run(run_batch(files, ocr, make_args(), writer))
+    writer.close({'successful': successful}, [{'file': f, 'error': e} for f, e in failed])
+
+    output = json.loads(out.getvalue())
+    assert sorted(result['file_path'] for result in output['results']) == ['a.png', 'c.png']
+    assert output['summary'] == {'successful': 2}
+    assert output['failed_files'] == [{'file': 'bad.png', 'error': 'unreadable'}]
+    assert max(ocr.peak) <= 2
+
+
+def test_result_writer_without_results():
+    """Test an empty batch still produces valid JSON without failed_files"""
+    out = io.BytesIO()
+    writer = ResultWriter(out)
+    writer.close({'successful': 0}, [])
+    assert json.loads(out.getvalue()) == {'results': [], 'summary': {'successful': 0}}
+
+
+def test_find_image_files(tmp_path):
+    """Test image files are found by extension, recursing only when asked"""
+    from batch_cli import find_image_files
+    (tmp_path / 'sub').mkdir()
+    for name in ['b.PNG', 'a.jpg', 'notes.txt', 'png', '.png', 'sub/c.tif']:
+        (tmp_path / name).write_bytes(b'')
+
+    assert find_image_files(str(tmp_path)) == [str(tmp_path / 'a.jpg'), str(tmp_path / 'b.PNG')]
+    assert find_image_files(str(tmp_path), recursive=True)[-1] == str(tmp_path / 'sub' / 'c.tif')
+
+
+def test_find_image_files_skips_unreadable_directories(tmp_path, monkeypatch):
+    """Test a directory that can't be listed is skipped instead of failing the batch"""
+    from batch_cli import find_image_files
+    (tmp_path / 'locked').mkdir()
+    (tmp_path / 'locked' / 'c.png').write_bytes(b'')
+    (tmp_path / 'a.png').write_bytes(b'')
+
+    scandir = os.scandir
+
+    def guarded_scandir(path):
+        if path.endswith('locked'):
+            raise PermissionError(13, 'Permission denied', path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', guarded_scandir)
+    assert find_image_files(str(tmp_path), recursive=True) == [str(tmp_path / 'a.png')]
+    assert find_image_files(str(tmp_path / 'locked')) == []
+
+
+def test_run_batch_groups_gemini_requests(ocr):
+    """Test --gemini-batch-size sends one Gemini request per group of files"""
+    class FakeGemini:
+        def __init__(self):
+            self.batches = []
+
+        async def process_text_batch_async(self, texts, **options):
+            self.batches.append(texts)
+            return [{'success': True, 'response': text.upper()} for text in texts]
+
+    gemini = FakeGemini()
+    files = ['a.png', 'b.png', 'c.png', 'd.png', 'e.png']
+    out = io.BytesIO()
+    writer = ResultWriter(out)
+    args = make_args(gemini=True, gemini_batch_size=2)
+    successful, failed = asyncio.run(run_batch(files, ocr, args, writer, gemini))
+    writer.close({}, [])
+
+    results = json.loads(out.getvalue())['results']
+    assert successful == 5 and not failed
+    assert sorted(len(batch) for batch in gemini.batches) == [1, 2, 2]
+    assert all(result['gemini']['response'] == result['text'].upper() for result in results)
+
+
+def hash_before_ocr(monkeypatch, ocr, count):
+    """Hold OCR until count files are hashed, so copies find their original in flight"""
+    import batch_cli
+    hashed = threading.Semaphore(0)
+    file_digest = batch_cli.file_digest
+    extract_text = ocr.extract_text
+
+    def counting_digest(file_path):
+        try:
+            return file_digest(file_path)
+        finally:
+            hashed.release()
+
+    def waiting_extract_text(image, **options):
+        for _ in range(count):
+            assert hashed.acquire(timeout=5)
+        for _ in range(count):
+            hashed.release()
+        return extract_text(image, **options)
+
+    monkeypatch.setattr(batch_cli, 'file_digest', counting_digest)
+    monkeypatch.setattr(ocr, 'extract_text', waiting_extract_text)
+
+
+def test_run_batch_bounds_outstanding_gemini_batches(ocr, monkeypatch):
+    """Test slow Gemini batches hold back new files instead of piling up"""
+    import batch_cli
+    monkeypatch.setattr(batch_cli, 'GEMINI_BATCHES_IN_FLIGHT', 2)
+    consumed = []
+    open_requests = []
+    finished = []
+
+    class SlowGemini:
+        async def process_text_batch_async(self, texts, **options):
+            open_requests.append(len(open_requests) + 1 - len(finished))
+            await asyncio.sleep(0.01)
+            finished.append(len(consumed))
+            return [{'success': True, 'response': text} for text in texts]
+
+    def files():
+        for i in range(40):
+            consumed.append(i)
+            yield f'{i}.png'
+
+    writer = ResultWriter(io.BytesIO())
+    args = make_args(gemini=True, gemini_batch_size=2)
+    successful, _ = asyncio.run(run_batch(files(), ocr, args, writer, SlowGemini()))
+    assert successful == 40
+    assert max(open_requests) <= 2
+    # Files read ahead of Gemini: the OCR window, its prefetch, and the
+    # batches that window can fill
+    assert all(count - 2 * done <= 2 * 2 * 2 + 2 * 2 + 4 for done, count in enumerate(finished, 1))
+
+
+def test_run_batch_ocrs_duplicate_files_once(ocr, tmp_path, monkeypatch):
+    """Test files with identical contents share one OCR result"""
+    files = []
+    for name, content in [('a.png', b'same'), ('b.png', b'other'), ('c.png', b'same')]:
+        (tmp_path / name).write_bytes(content)
+        files.append(str(tmp_path / name))
+    hash_before_ocr(monkeypatch, ocr, len(files))
+    out = io.BytesIO()
+    writer = ResultWriter(out)
+    successful, failed = asyncio.run(run_batch(files, ocr, make_args(), writer))
+    writer.close({}, [])
+
+    results = {result['file_path']: result for result in json.loads(out.getvalue())['results']}
+    assert successful == 3 and not failed
+    assert len(ocr.peak) == 2
+    duplicate = results[files[2]] if 'duplicate_of' in results[files[2]] else results[files[0]]
+    assert duplicate['text'] == duplicate['duplicate_of']
+
+
+def test_run_batch_sends_duplicate_text_to_gemini_once(ocr, tmp_path, monkeypatch):
+    """Test copies get their original's Gemini response instead of a request of their own"""
+    class FakeGemini:
+        def __init__(self):
+            self.texts = []
+
+        async def process_text_batch_async(self, texts, **options):
+            self.texts.extend(texts)
+            return [{'success': True, 'response': text.upper()} for text in texts]
+
+    files = []
+    for name in ['a.png', 'b.png', 'c.png']:
+        (tmp_path / name).write_bytes(b'same')
+        files.append(str(tmp_path / name))
+    hash_before_ocr(monkeypatch, ocr, len(files))
+    gemini = FakeGemini()
+    out = io.BytesIO()
+    writer = ResultWriter(out)
+    args = make_args(gemini=True, gemini_batch_size=2)
+    successful, failed = asyncio.run(run_batch(files, ocr, args, writer, gemini))
+    writer.close({}, [])
+
+    results = json.loads(out.getvalue())['results']
+    assert successful == 3 and not failed
+    assert len(gemini.texts) == 1
+    assert all(result['gemini']['response'] == gemini.texts[0].upper() for result in results)
+    assert sum('duplicate_of' in result for result in results) == 2
+
+
+def test_run_batch_fails_copies_with_their_original(ocr, tmp_path, monkeypatch):
+    """Test copies of a file that fails are reported as failed too"""
+    files = []
+    for name in ['bad.png', 'bad-copy.png']:
+        (tmp_path / name).write_bytes(b'same')
+        files.append(str(tmp_path / name))
+    hash_before_ocr(monkeypatch, ocr, len(files))
+    writer = ResultWriter(io.BytesIO())
+    successful, failed = asyncio.run(run_batch(files, ocr, make_args(), writer))
+
+    assert successful == 0
+    assert sorted(path for path, _ in failed) == sorted(files)
+
+
+def test_run_batch_reuses_stored_results(ocr, tmp_path):
+    """Test a second run over unchanged files skips OCR"""
+    from ocr_cache import ResultStore
+    image = tmp_path / 'a.png'
+    image.write_bytes(b'image')
+    store_path = str(tmp_path / 'results.sqlite3')
+
+    for expected_calls in [1, 1]:
+        store = ResultStore(store_path)
+        out = io.BytesIO()
+        writer = ResultWriter(out)
+        asyncio.run(run_batch([str(image)], ocr, make_args(), writer, store=store))
+        writer.close({}, [])
+        store.close()
+        assert len(ocr.peak) == expected_calls
+
+    result = json.loads(out.getvalue())['results'][0]
+    assert result['cached'] is True
+    assert result['text'] == str(image)
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_result_writer_encoders_agree(monkeypatch, use_orjson):
+    """Test output is the same JSON with and without orjson"""
+    import batch_cli
+    if use_orjson:
+        pytest.importorskip('orjson')
+    monkeypatch.setattr(batch_cli, 'ORJSON_AVAILABLE', use_orjson)
+    out = io.BytesIO()
+    writer = ResultWriter(out)
+    writer.add({'file_path': 'é.png', 'text': 'ñandú', 'confidence': 91.5})
+    writer.close({'successful': 1}, [])
+    assert json.loads(out.getvalue()) == {
+        'results': [{'file_path': 'é.png', 'text': 'ñandú', 'confidence': 91.5}],
+        'summary': {'successful': 1}
+    }
+    assert 'ñandú'.encode() in out.getvalue()
+
+
+def test_run_batch_shares_one_gemini_client(ocr):
+    """Test every per-file Gemini request goes through the same HTTP client"""
+    clients = []
+
+    class FakeGemini:
+        async def process_text_async(self, text, client=None, **options):
+            clients.append(client)
+            return {'success': True, 'response': text}
+
+    files = ['a.png', 'b.png', 'c.png']
+    writer = ResultWriter(io.BytesIO())
+    asyncio.run(run_batch(files, ocr, make_args(gemini=True), writer, FakeGemini()))
+
+    assert len(clients) == 3 and len(set(map(id, clients))) == 1
+    assert clients[0].is_closed
+
+
+def test_daemon_serves_client_batches(ocr, tmp_path, monkeypatch, capsysbinary):
+    """Test ocr_client gets the same results document from a running daemon"""
+    import sys
+    import ocr_client
+    from batch_cli import serve
+    for name in ['a.png', 'bad.png']:
+        (tmp_path / name).write_bytes(name.encode())
+    socket_path = str(tmp_path / 'd.sock')
+    args = make_args(recursive=False, gemini=False)
+    argv = ['ocr_client.py', socket_path, str(tmp_path), '--continue-on-error']
+    monkeypatch.setattr(sys, 'argv', argv)
+
+    async def scenario():
+        server = asyncio.ensure_future(serve(socket_path, ocr, args))
+        while not (tmp_path / 'd.sock').exists():
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(ocr_client.main)
+        server.cancel()
+
+    asyncio.run(scenario())
+
+    output = json.loads(capsysbinary.readouterr().out)
+    assert [result['file_path'] for result in output['results']] == [str(tmp_path / 'a.png')]
+    assert output['summary']['total_files'] == 2
+    assert output['failed_files'][0]['file'] == str(tmp_path / 'bad.png')
+    assert not (tmp_path / 'd.sock').exists()
+
+
+def test_run_batch_bounds_files_in_flight(ocr):
+    """Test files are pulled lazily, a few per worker, not all up front"""
+    consumed = []
+
+    def files():
+        for i in range(50):
+            consumed.append(i)
+            yield f'{i}.png'
+
+    class Writer(ResultWriter):
+        def add(self, result):
+            self.first = getattr(self, 'first', len(consumed))
+            super().add(result)
+
+    writer = Writer(io.BytesIO())
+    successful, _ = asyncio.run(run_batch(files(), ocr, make_args(), writer))
+    assert successful == 50
+    # A window in flight plus a window being prefetched
+    assert writer.first <= 2 * (2 * 2) + 1
+
+
+def test_process_pool_ocr_runs_in_workers(tmp_path):
+    """Test OCR requests round-trip through worker processes"""
+    from batch_cli import ProcessPoolOCR, ocr_process_pool
+    executor = ocr_process_pool(1, None, 'eng', '--psm 6')
+    try:
+        result = ProcessPoolOCR(executor).extract_text(str(tmp_path / 'missing.png'), preprocess=True)
+    finally:
+        executor.shutdown()
+    assert result['text'] == '' and 'error' in result
+
+
+def test_run_batch_prefetches_upcoming_files(ocr, monkeypatch):
+    """Test every file is prefetched once, on the I/O threads rather than the event loop"""
+    import batch_cli
+    prefetches = []
+    monkeypatch.setattr(
+        batch_cli, 'prefetch', lambda path: prefetches.append((path, threading.current_thread().name))
+    )
+    files = [f'{i}.png' for i in range(20)]
+    asyncio.run(run_batch(files, ocr, make_args(), ResultWriter(io.BytesIO())))
+
+    assert sorted(path for path, _ in prefetches) == sorted(files)
+    assert all(thread.startswith('ocr-gaby-io') for _, thread in prefetches)
+
+
+def test_prefetched_runs_ahead_in_order(monkeypatch):
+    """Test files are prefetched ahead of being yielded, in order"""
+    import batch_cli
+    events = []
+    monkeypatch.setattr(batch_cli, 'prefetch', lambda path: events.append(('prefetch', path)))
+    for path in batch_cli.prefetched(['a', 'b', 'c'], 1):
+        events.append(('yield', path))
+    assert events == [
+        ('prefetch', 'a'), ('prefetch', 'b'), ('yield', 'a'),
+        ('prefetch', 'c'), ('yield', 'b'), ('yield', 'c')
+    ]
+
+
+def test_result_stores_share_a_database(tmp_path):
+    """Test two stores on one file write without waiting on each other"""
+    import time
+    from ocr_cache import ResultStore
+    path = str(tmp_path / 'results.sqlite3')
+    first, second = ResultStore(path), ResultStore(path)
+    first.set('a', {'text': 'one'})
+    started = time.monotonic()
+    second.set('b', {'text': 'two'})
+    assert time.monotonic() - started < 0.05
+    assert first.get('b') == {'text': 'two'} and second.get('a') == {'text': 'one'}
+    first.close()
+    second.close()
+
+
+def test_result_store_key_depends_on_engine():
+    """Test results from another Tesseract build or model aren't reused"""
+    from ocr_cache import ResultStore
+    assert ResultStore.key('d', 'eng', '--psm 6', False, 'tesseract 5.3') != \
+        ResultStore.key('d', 'eng', '--psm 6', False, 'tesseract 5.5')
+
+
+def test_engine_identity_uses_the_given_binary(tmp_path):
+    """Test a custom --tesseract-cmd is identified even if pytesseract points elsewhere"""
+    from cli import engine_identity
+    fake = tmp_path / 'tesseract'
+    fake.write_text('#!/bin/sh\necho "tesseract 9.9.9-custom"\n')
+    fake.chmod(0o755)
+    assert 'tesseract 9.9.9-custom' in engine_identity('eng', str(fake))
+    assert 'tesseract 9.9.9-custom' not in engine_identity('eng')
+
+
+def test_daemon_rejects_mistyped_options(ocr, tmp_path):
+    """Test a job option of the wrong type gets an error line, not a crash"""
+    import stat
+    from batch_cli import serve
+    (tmp_path / 'a.png').write_bytes(b'a')
+    socket_path = str(tmp_path / 'd.sock')
+
+    async def scenario():
+        server = asyncio.ensure_future(serve(socket_path, ocr, make_args(recursive=False, gemini=False)))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+        mode = stat.S_IMODE(os.stat(socket_path).st_mode)
+        replies = []
+        for options in [{'gemini_batch_size': '5'}, {'preprocess': 1}, {'inputs': str(tmp_path)}]:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(json.dumps({'inputs': [str(tmp_path)], **options}).encode() + b'\n')
+            replies.append(json.loads(await reader.readline()))
+            writer.close()
+        server.cancel()
+        return mode, replies
+
+    mode, replies = asyncio.run(scenario())
+    assert mode == 0o600
+    assert [reply['error'] for reply in replies] == [
+        "Invalid value for gemini_batch_size: '5'",
+        'Invalid value for preprocess: 1',
+        'inputs must be a list of paths'
+    ]
+
+
+def test_daemon_takes_long_requests(ocr, tmp_path, monkeypatch):
+    """Test a request naming thousands of paths is read, and an oversized one reported"""
+    import batch_cli
+    from batch_cli import serve
+    (tmp_path / 'a.png').write_bytes(b'a')
+    # Well past asyncio's default 64 KiB line limit
+    inputs = [str(tmp_path / 'a.png')] * 3000
+
+    async def request(socket_path):
+        server = asyncio.ensure_future(serve(socket_path, ocr, make_args(recursive=False, gemini=False)))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(json.dumps({'inputs': inputs}).encode() + b'\n')
+        lines = [json.loads(line) async for line in reader]
+        writer.close()
+        server.cancel()
+        return lines[-1]
+
+    async def scenario():
+        replies = [await request(str(tmp_path / 'd.sock'))]
+        monkeypatch.setattr(batch_cli, 'MAX_JOB_REQUEST', 1024)
+        replies.append(await request(str(tmp_path / 'small.sock')))
+        return replies
+
+    summary, too_large = asyncio.run(scenario())
+    assert summary['summary']['total_files'] == 3000
+    assert too_large['error'].startswith('Batch request too large')
+
+
+def test_run_batch_stops_when_the_reader_goes_away(ocr):
+    """Test results wait on the writer's drain, and a lost reader ends the batch"""
+    class ClosedWriter(ResultWriter):
+        async def drain(self):
+            raise ConnectionResetError
+
+    consumed = []
+
+    def files():
+        for i in range(50):
+            consumed.append(i)
+            yield f'{i}.png'
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(run_batch(files(), ocr, make_args(), ClosedWriter(io.BytesIO())))
+    assert len(consumed) < 50
@@ -0,0 +1,226 @@
+import json
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import cli
+from cli import OCRProcessor, data_from_tsv, is_pdf, text_from_data
+
+
+def make_pdf(pages):
+    pdfium = pytest.importorskip('pypdfium2')
+    document = pdfium.PdfDocument.new()
+    for _ in range(pages):
+        document.new_page(200, 100)
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def test_is_pdf():
+    """Test PDFs are recognized by contents or extension"""
+    assert is_pdf(b'%PDF-1.7 ...')
+    assert is_pdf('scan.PDF')
+    assert not is_pdf(b'\x89PNG')
+    assert not is_pdf('scan.png')
+
+
+def test_extract_text_pdf_merges_pages(monkeypatch):
+    """Test each page is rendered and OCR'd, then merged in page order"""
+    processor = OCRProcessor()
+    seen = []
+
+    def extract_text(image, language='eng', config='--psm 6', preprocess=False, max_workers=None):
+        assert isinstance(image, Image.Image)
+        seen.append(image.size)
+        return {'text': 'page', 'confidence': 80.0, 'word_count': 1}
+
+    monkeypatch.setattr(processor, 'extract_text', extract_text)
+    result = processor.extract_text_pdf(make_pdf(3))
+
+    assert result['page_count'] == 3
+    assert result['text'] == 'page\n\npage\n\npage'
+    assert result['word_count'] == 3
+    assert result['confidence'] == 80.0
+    assert seen == [(400, 200)] * 3
+
+
+def test_extract_text_pdf_binarizes_pages_when_preprocessing(monkeypatch):
+    """Test preprocessed pages reach OCR already binarized"""
+    import numpy as np
+    processor = OCRProcessor()
+    seen = []
+
+    def extract_text(image, language='eng', config='--psm 6', preprocess=False, max_workers=None):
+        seen.append((image, preprocess))
+        return {'text': 'page', 'confidence': 80.0, 'word_count': 1}
+
+    monkeypatch.setattr(processor, 'extract_text', extract_text)
+    result = processor.extract_text_pdf(make_pdf(2), preprocess=True)
+
+    assert result['page_count'] == 2
+    for image, preprocess in seen:
+        assert image.shape == (200, 400) and not preprocess
+        assert set(np.unique(image)) <= {0, 255}
+
+
+def test_extract_text_pdf_renders_pages_in_groups(monkeypatch):
+    """Test only max_workers pages are rendered and binarized at a time"""
+    processor = OCRProcessor()
+    groups = []
+    binarize_pages = cli.binarize_pages
+
+    def recording_binarize_pages(pages):
+        groups.append(len(pages))
+        return binarize_pages(pages)
+
+    monkeypatch.setattr(cli, 'binarize_pages', recording_binarize_pages)
+    monkeypatch.setattr(processor, 'extract_text', lambda image, language, config: {
+        'text': 'page', 'confidence': 80.0, 'word_count': 1
+    })
+    result = processor.extract_text_pdf(make_pdf(5), preprocess=True, max_workers=2)
+
+    assert result['page_count'] == 5
+    assert groups == [2, 2, 1]
+
+
+def test_otsu_thresholds_match_opencv():
+    """Test batched thresholds agree with OpenCV's Otsu image by image"""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(0)
+    images = [
+        rng.integers(0, 256, (30, 40), dtype=np.uint8),
+        np.where(rng.random((30, 40)) < 0.3, 40, 200).astype(np.uint8),
+        rng.normal(120, 30, (30, 40)).clip(0, 255).astype(np.uint8),
+        np.full((30, 40), 7, np.uint8),
+    ]
+    expected = [cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0] for image in images]
+    assert cli.otsu_thresholds(np.stack(images)).tolist() == expected
+
+    # Pages are binarized in place
+    pages = cli.binarize_pages([images[0].copy(), np.zeros((5, 5), np.uint8), images[1].copy()])
+    assert [page.shape for page in pages] == [(30, 40), (5, 5), (30, 40)]
+    assert np.array_equal(
+        pages[2], cv2.threshold(images[1], 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    )
+
+
+def tsv_data(rows):
+    """image_to_data style dict from (block, par, line, text, conf) rows"""
+    keys = ['block_num', 'par_num', 'line_num', 'text', 'conf']
+    return {key: [row[i] for row in rows] for i, key in enumerate(keys)}
+
+
+def test_text_from_data_keeps_layout():
+    """Test words, lines and paragraphs are rebuilt from word data"""
+    data = tsv_data([
+        (1, 1, 1, '', -1),
+        (1, 1, 1, 'Hello', 95),
+        (1, 1, 1, 'world', 90),
+        (1, 1, 2, 'again', 85),
+        (1, 2, 1, 'New', 80),
+        (2, 1, 1, 'Block', 75),
+    ])
+    assert text_from_data(data) == 'Hello world\nagain\n\nNew\n\nBlock'
+
+
+def tsv_bytes(rows):
+    """Raw image_to_data TSV output from (block, par, line, text, conf) rows"""
+    lines = ['level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext']
+    for block, paragraph, line, text, conf in rows:
+        lines.append(f'5\t1\t{block}\t{paragraph}\t{line}\t1\t0\t0\t10\t10\t{conf}\t{text}')
+    return '\n'.join(lines).encode()
+
+
+def test_data_from_tsv_reads_columns():
+    """Test TSV rows become columns with float confidences"""
+    data = data_from_tsv(tsv_bytes([(1, 1, 1, 'Hello', 95.5), (1, 1, 2, 'a b', -1)]))
+    assert data['text'] == ('Hello', 'a b')
+    assert data['line_num'] == ('1', '2')
+    assert data['conf'].tolist() == [95.5, -1.0]
+
+    # Last row without its text cell, and empty output
+    data = data_from_tsv(tsv_bytes([(1, 1, 1, 'Hello', 90)]) + b'\n1\t1\t0\t0\t0\t0\t0\t0\t1\t1\t-1')
+    assert data['text'] == ('Hello', '')
+    assert data_from_tsv(b'')['conf'].size == 0
+
+
+def test_extract_text_runs_tesseract_once(monkeypatch):
+    """Test text and confidence both come from a single image_to_data run"""
+    calls = []
+
+    def image_to_data(image, **kwargs):
+        calls.append(kwargs)
+        assert kwargs['output_type'] == cli.pytesseract.Output.BYTES
+        return tsv_bytes([(1, 1, 1, 'Hello', 90), (1, 1, 1, 'world', 80), (1, 1, 1, '', -1)])
+
+    def image_to_string(image, **kwargs):
+        raise AssertionError('image_to_string should not be called')
+
+    monkeypatch.setattr(cli.pytesseract, 'image_to_data', image_to_data)
+    monkeypatch.setattr(cli.pytesseract, 'image_to_string', image_to_string)
+
+    result = OCRProcessor().extract_text(Image.new('RGB', (10, 10)))
+    assert result['text'] == 'Hello world'
+    assert result['confidence'] == 85.0
+    assert result['word_count'] == 2
+    assert len(calls) == 1
+
+
+def test_preprocess_image_is_binary_grayscale():
+    """Test preprocessing yields a single-channel black and white image"""
+    import numpy as np
+    image = Image.new('RGB', (40, 20), 'white')
+    image.paste((0, 0, 0), (10, 5, 30, 15))
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+
+    for source in (buffer.getvalue(), image):
+        pixels = OCRProcessor()._preprocess_image(source)
+        assert pixels.dtype == np.uint8
+        assert pixels.shape == (20, 40)
+        assert set(np.unique(pixels)) <= {0, 255}
+        assert pixels[10, 20] == 0 and pixels[0, 0] == 255
+
+
+def test_preprocess_buffers_are_reused(monkeypatch):
+    """Test preprocessing scratch arrays go back to the pool after OCR"""
+    image = Image.new('L', (40, 20), 'white')
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    seen = []
+
+    def image_to_data(image, **kwargs):
+        seen.append(image)
+        return tsv_bytes([(1, 1, 1, 'Hello', 90)])
+
+    monkeypatch.setattr(cli.pytesseract, 'image_to_data', image_to_data)
+    processor = OCRProcessor()
+    for _ in range(3):
+        assert processor.extract_text(buffer.getvalue(), preprocess=True)['text'] == 'Hello'
+    assert seen[2] is seen[0]
+
+
+def test_is_image_name():
+    """Test extensions are matched case-insensitively after the last dot"""
+    assert cli.is_image_name('scan.PNG')
+    assert cli.is_image_name('archive.tar.tif')
+    assert not cli.is_image_name('.png')
+    assert not cli.is_image_name('png')
+    assert not cli.is_image_name('scan.png.txt')
+    assert not cli.is_image_name('scan.')
+
+
+def test_extract_text_uses_pooled_engine_confidences():
+    """Test pooled results count every word but average only positive confidences"""
+    class FakePool:
+        def recognize(self, image, language, config):
+            return 'one two three\n', [90, 0, 80]
+
+    result = OCRProcessor(pool=FakePool()).extract_text(Image.new('L', (10, 10)))
+    assert result['text'] == 'one two three'
+    assert result['word_count'] == 3
+    assert result['confidence'] == 85.0
+    json.dumps(result)
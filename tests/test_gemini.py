@@ -0,0 +1,74 @@
+from app.gemini import TASK_DESCRIPTIONS, get_gemini
+
+
+def test_get_gemini_reuses_processor():
+    """Test processors are shared per API key"""
+    assert get_gemini('key-one') is get_gemini('key-one')
+    assert get_gemini('key-one') is not get_gemini('key-two')
+
+
+def test_task_prompts():
+    """Test every task has a template and unknown tasks fall back to analyze"""
+    gemini = get_gemini('key-one')
+    for task in TASK_DESCRIPTIONS:
+        assert gemini._build_task_prompt('{braces} ok', task).rstrip().endswith('{braces} ok')
+    assert gemini._build_task_prompt('x', 'nope') == gemini._build_task_prompt('x', 'analyze')
+
+
+def test_process_text_async_uses_shared_client():
+    """Test the REST path sends the API key and camelCase generation config"""
+    import asyncio
+    import httpx
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={
+            'candidates': [{'content': {'parts': [{'text': 'a summary'}]}}],
+            'usageMetadata': {'promptTokenCount': 42, 'candidatesTokenCount': 3}
+        })
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await get_gemini('key-one').process_text_async(
+                'some text', task='summarize', max_tokens=50, client=client
+            )
+
+    result = asyncio.run(run())
+    assert result['success'] is True
+    assert result['response'] == 'a summary'
+    assert result['usage'] == {'prompt_tokens': 42, 'completion_tokens': 3}
+    assert requests[0].headers['x-goog-api-key'] == 'key-one'
+    assert b'"maxOutputTokens":50' in requests[0].content.replace(b' ', b'')
+
+
+def test_process_text_batch_async_splits_answers():
+    """Test one request covers several texts and answers are matched by marker"""
+    import asyncio
+    import httpx
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        reply = (
+            '<<<DOC_2_START>>>second<<<DOC_2_END>>>\n'
+            '<<<DOC_1_START>>>\nfirst\n<<<DOC_1_END>>>'
+        )
+        return httpx.Response(200, json={
+            'candidates': [{'content': {'parts': [{'text': reply}]}}]
+        })
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await get_gemini('key-one').process_text_batch_async(
+                ['one', 'two', 'three'], task='summarize', client=client
+            )
+
+    results = asyncio.run(run())
+    assert len(requests) == 1
+    assert [result['response'] for result in results[:2]] == ['first', 'second']
+    assert results[2]['success'] is False
+    # Each result names the instructions, not every document in the request
+    assert 'one' not in results[0]['prompt_used'] and 'two' not in results[1]['prompt_used']
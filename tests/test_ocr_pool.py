@@ -0,0 +1,135 @@
+import pytest
+
+pytest.importorskip("tesserocr")
+
+import ocr_pool
+from ocr_pool import create_pool, parse_tesseract_config
+
+
+def test_parse_psm_and_oem():
+    """Test page segmentation and engine modes are read from the config"""
+    assert parse_tesseract_config('--oem 1 --psm 6') == (6, 1, {})
+
+
+def test_parse_variables():
+    """Test -c name=value pairs become engine variables"""
+    psm, _, variables = parse_tesseract_config('--psm 4 -c tessedit_char_whitelist=0123456789')
+    assert psm == 4
+    assert variables == {'tessedit_char_whitelist': '0123456789'}
+
+
+def test_parse_unsupported_option():
+    """Test options the engine can't take fall back to the binary"""
+    assert parse_tesseract_config('--psm 6 --dpi 300') is None
+
+
+def test_create_pool_falls_back_when_engines_fail(monkeypatch):
+    """Test a pool whose engines can't start is replaced by None"""
+    def warm(self, language='eng', config='--psm 6'):
+        raise RuntimeError('Failed to init API')
+
+    monkeypatch.setattr(ocr_pool.TesseractPool, 'warm', warm)
+    assert create_pool(2) is None
+
+
+def test_image_buffer_pool_reuses_and_evicts():
+    """Test released arrays are reused by shape, oldest sizes dropped first"""
+    import numpy as np
+    from ocr_pool import ImageBufferPool
+    buffers = ImageBufferPool(max_idle=2)
+    small = buffers.acquire((2, 3))
+    buffers.release(small)
+    assert buffers.acquire((2, 3)) is small
+    assert buffers.acquire((3, 2)) is not small
+
+    buffers.release(small)
+    buffers.release(np.empty((4, 4), np.uint8))
+    buffers.release(np.empty((5, 5), np.uint8))
+    assert buffers.acquire((2, 3)) is not small
+
+    buffers.release(np.zeros((6, 6))[:3])
+    assert buffers.acquire((3, 6), np.float64).base is None
+
+
+def test_image_buffer_pool_caps_bytes():
+    """Test idle buffers are bounded by total size, and huge ones aren't kept"""
+    import numpy as np
+    from ocr_pool import ImageBufferPool
+    buffers = ImageBufferPool(max_idle=8, max_idle_bytes=100, max_buffer_bytes=60)
+    huge = np.empty(61, np.uint8)
+    buffers.release(huge)
+    assert buffers.acquire((61,)) is not huge
+
+    pair = [np.empty(50, np.uint8), np.empty(50, np.uint8)]
+    for buffer in pair:
+        buffers.release(buffer)
+    square = np.empty((5, 10), np.uint8)
+    buffers.release(square)
+    # 150 bytes idle: one of the older pair had to go
+    assert any(buffers.acquire((50,)) is buffer for buffer in pair)
+    assert not any(buffers.acquire((50,)) is buffer for buffer in pair)
+    assert buffers.acquire((5, 10)) is square
+
+
+def test_pool_caps_distinct_configs(monkeypatch):
+    """Test new settings evict idle ones, and busy pools fall back to the binary"""
+    ended = []
+
+    class FakeEngine:
+        def __init__(self, **kwargs):
+            self.variables = kwargs['variables']
+
+        def Clear(self):
+            pass
+
+        def End(self):
+            ended.append(self.variables)
+
+    monkeypatch.setattr(ocr_pool, 'PyTessBaseAPI', FakeEngine)
+    pool = ocr_pool.TesseractPool(1, max_configs=2)
+    for value in ['1', '2', '3']:
+        with pool.engine('eng', 6, 3, {'x': value}) as engine:
+            assert engine is not None
+    assert ended == [{'x': '1'}]
+
+    busy = [pool.acquire('eng', 6, 3, {'x': value}) for value in ['2', '3']]
+    assert pool.acquire('eng', 6, 3, {'x': '4'}) is None
+    for value, engine in zip(['2', '3'], busy):
+        pool.release(engine, 'eng', 6, 3, {'x': value})
+
+    # Engines returned after close() are ended, not put back
+    engine = pool.acquire('eng', 6, 3, {'x': '2'})
+    pool.close()
+    pool.release(engine, 'eng', 6, 3, {'x': '2'})
+    assert ended[-1] == {'x': '2'}
+
+
+def test_pool_keeps_settings_with_waiters(monkeypatch):
+    """Test settings a caller is waiting on are never evicted from under it"""
+    import threading
+    import time
+
+    class FakeEngine:
+        def __init__(self, **kwargs):
+            self.variables = kwargs['variables']
+
+        def Clear(self):
+            pass
+
+        def End(self):
+            pass
+
+    monkeypatch.setattr(ocr_pool, 'PyTessBaseAPI', FakeEngine)
+    pool = ocr_pool.TesseractPool(1, max_configs=1)
+    engine = pool.acquire('eng', 6, 3, {'x': '1'})
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire('eng', 6, 3, {'x': '1'})))
+    waiter.start()
+    while not pool._waiting:
+        time.sleep(0.001)
+
+    # Released and idle, but still wanted by the waiter
+    pool.release(engine, 'eng', 6, 3, {'x': '1'})
+    assert pool.acquire('eng', 6, 3, {'x': '2'}) is None
+    waiter.join(timeout=5)
+    assert got == [engine]